@@ -0,0 +1,56 @@
+#!/usr/bin/env python2.7
+'''
+    Compare constructing BaseInfo from lines against the trusted from_fields
+    constructor and SlottedBaseInfo
+
+    Usage: python benchmarks/bench_baseinfo.py [454AlignmentInfo.tsv]
+'''
+import os.path
+import sys
+import time
+
+sys.path.insert( 0, os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), '..' ) )
+
+from roche.newbler.fileparsers.alignmentinfo import (BaseInfo, SlottedBaseInfo,
+    parse_columns, MAPPING_COLUMNS, EXACT_DTYPES)
+
+DEFAULT_FILE = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), '..', 'roche', 'newbler',
+    'fileparsers', 'tests', 'fixtures', 'R03_548__TI46__Den2', 'mapping', '454AlignmentInfo.tsv' )
+
+def base_lines( filepath ):
+    with open( filepath ) as fh:
+        return [line.strip() for line in fh if line[0] in '123456789']
+
+def sizeof( obj ):
+    ''' Size of an object including its __dict__ '''
+    size = sys.getsizeof( obj )
+    if hasattr( obj, '__dict__' ):
+        size += sys.getsizeof( obj.__dict__ )
+    return size
+
+def bench( name, func ):
+    start = time.time()
+    bases = func()
+    elapsed = time.time() - start
+    print "{:<30} {:>12,.0f} objects/s {:>6} bytes/base".format(
+        name, len( bases ) / elapsed, sizeof( bases[0] ) )
+
+def main():
+    filepath = DEFAULT_FILE
+    if len( sys.argv ) > 1:
+        filepath = sys.argv[1]
+    lines = base_lines( filepath ) * 5
+    print "{} base lines from {}".format( len( lines ), filepath )
+
+    def rows():
+        columns = parse_columns( lines, EXACT_DTYPES )
+        values = [columns[name].tolist() if name in columns else [None] * len( lines )
+            for name in MAPPING_COLUMNS]
+        return zip( *values )
+
+    bench( 'BaseInfo( line )', lambda: [BaseInfo( line ) for line in lines] )
+    bench( 'BaseInfo.from_fields', lambda: [BaseInfo.from_fields( *row ) for row in rows()] )
+    bench( 'SlottedBaseInfo.from_fields', lambda: [SlottedBaseInfo.from_fields( *row ) for row in rows()] )
+
+if __name__ == '__main__':
+    main()
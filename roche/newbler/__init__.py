@@ -1,2 +1,3 @@
 from projectdir import ProjectDirectory
-__all__ = [ProjectDirectory,]
+from coveragematrix import CoverageMatrix
+__all__ = [ProjectDirectory,CoverageMatrix,]
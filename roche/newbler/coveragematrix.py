@@ -0,0 +1,162 @@
+###
+## Align depth of many projects mapped to the same references as one array per reference
+###
+
+import os
+import os.path
+from multiprocessing import Pool
+
+import numpy as np
+
+from fileparsers.alignmentinfo import iter_alignments
+from fileparsers.alignmentindex import next_header
+from fileparsers.tokenizer import MappedFile
+
+class CoverageMatrix( object ):
+    '''
+        Dense (samples x positions) align depth array for every reference where
+        row i is samples[i] and column j is position j+1.
+        Positions a sample does not cover have 0 depth and positions that have indels
+        use the first base line(same as ReferenceTrack)
+    '''
+    def __init__( self, samples, matrices ):
+        '''
+            @param samples - List of sample names in row order
+            @param matrices - dictionary of reference name: 2d array of align depth
+        '''
+        self.samples = list( samples )
+        self.matrices = matrices
+
+    @classmethod
+    def from_projects( cls, projects, names=None, directory=None, workers=1 ):
+        '''
+            Build from ProjectDirectory instances(or anything with get_file)
+
+            @param projects - List of ProjectDirectory
+            @param names - Sample names. Defaults to the project directory names
+            @param directory - Store the arrays as memory mapped .npy files in this directory
+                instead of in memory
+            @param workers - Number of processes to parse the 454AlignmentInfo.tsv files with
+            @return CoverageMatrix
+        '''
+        if names is None:
+            names = [os.path.basename( os.path.normpath( pd.basepath ) ) for pd in projects]
+        paths = [pd.get_file( '454AlignmentInfo' ) for pd in projects]
+        return cls.from_files( paths, names, directory, workers )
+
+    @classmethod
+    def from_files( cls, paths, names=None, directory=None, workers=1 ):
+        '''
+            Build from 454AlignmentInfo.tsv paths
+
+            @param paths - List of 454AlignmentInfo.tsv paths
+            @param names - Sample names. Defaults to paths
+            (see from_projects for the rest)
+        '''
+        if names is None:
+            names = paths
+        if len( names ) != len( paths ):
+            raise ValueError( "Got {} names for {} samples".format( len( names ), len( paths ) ) )
+        # Every reference is as long as the furthest position any sample covers
+        lengths = {}
+        for path in paths:
+            for ref, length in reference_lengths( path ).items():
+                lengths[ref] = max( lengths.get( ref, 0 ), length )
+        matrices = {}
+        for i, ref in enumerate( sorted( lengths ) ):
+            shape = (len( paths ), lengths[ref])
+            if directory is None:
+                matrices[ref] = np.zeros( shape, dtype=np.int32 )
+            else:
+                # Reference names contain / so files are numbered instead
+                path = os.path.join( directory, 'ref{}.npy'.format( i ) )
+                matrices[ref] = np.lib.format.open_memmap( path, mode='w+', dtype=np.int32, shape=shape )
+
+        # Samples are written into their rows as they are parsed instead of all being kept first
+        pool = None
+        if workers > 1:
+            pool = Pool( workers )
+            depths = pool.imap( sample_depths, paths )
+        else:
+            depths = (sample_depths( path ) for path in paths)
+        try:
+            for row, sample in enumerate( depths ):
+                for ref, (positions, depth) in sample.items():
+                    matrices[ref][row, positions - 1] = depth
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        for matrix in matrices.values():
+            if isinstance( matrix, np.memmap ):
+                matrix.flush()
+        return cls( names, matrices )
+
+    @property
+    def references( self ):
+        return sorted( self.matrices )
+
+    def __getitem__( self, ref ):
+        ''' (samples x positions) align depth array of ref '''
+        return self.matrices[ref]
+
+    def depth( self, sample, ref ):
+        '''
+            @param sample - Sample name
+            @param ref - Reference name
+            @return align depth array of ref for a single sample
+        '''
+        return self.matrices[ref][self.samples.index( sample )]
+
+def reference_lengths( filepath ):
+    '''
+        Last position of every reference in a 454AlignmentInfo.tsv found from the
+        last line of every > block without parsing the rest of the lines
+
+        @param filepath - Path to 454AlignmentInfo.tsv
+        @return dictionary of reference name: last position
+    '''
+    lengths = {}
+    with MappedFile( filepath ) as mf:
+        data = mf.data
+        offset = next_header( data, 0 )
+        while offset != -1:
+            lineend = data.find( '\n', offset )
+            if lineend == -1:
+                break
+            name = data[offset+1:lineend].split()[0]
+            nextoffset = next_header( data, lineend )
+            end = len( data ) if nextoffset == -1 else nextoffset
+            # Skip blank lines at the end of the block
+            blockend = end
+            while blockend > lineend + 1 and data[blockend-1] == '\n':
+                blockend -= 1
+            if blockend > lineend + 1:
+                linestart = data.rfind( '\n', lineend, blockend ) + 1
+                last = int( data[linestart:blockend].split( '\t', 1 )[0] )
+                lengths[name] = max( lengths.get( name, 0 ), last )
+            offset = nextoffset
+    return lengths
+
+def sample_depths( filepath ):
+    '''
+        Align depth at every covered position of every reference in a 454AlignmentInfo.tsv
+
+        @param filepath - Path to 454AlignmentInfo.tsv
+        @return dictionary of reference name: (positions, adepth) arrays
+    '''
+    columns = {}
+    for sa in iter_alignments( filepath, columnar=True ):
+        if not len( sa ):
+            continue
+        # First base line of every position
+        positions, first = np.unique( sa.pos, return_index=True )
+        columns.setdefault( sa.name, [] ).append( (positions, sa.adepth[first]) )
+    depths = {}
+    for ref, parts in columns.items():
+        positions = np.concatenate( [p for p, d in parts] )
+        depth = np.concatenate( [d for p, d in parts] )
+        # Positions more than one contig covers use the first contig(same as ReferenceTrack)
+        positions, first = np.unique( positions, return_index=True )
+        depths[ref] = (positions, depth[first])
+    return depths
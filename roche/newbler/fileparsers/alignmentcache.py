@@ -0,0 +1,123 @@
+###
+## Binary cache of the columns parsed from 454AlignmentInfo.tsv
+###
+
+import os
+import os.path
+import hashlib
+
+import numpy as np
+
+# Bump when the layout of the cache file changes
+CACHE_VERSION = 2
+# Appended to the 454AlignmentInfo.tsv path when no cache directory is given
+CACHE_SUFFIX = '.cache.npy'
+
+def cache_path( filepath, cachedir=None ):
+    '''
+        Where the cache for filepath is stored
+
+        @param filepath - Path to 454AlignmentInfo.tsv
+        @param cachedir - Directory to keep caches in. Defaults to next to filepath
+        @return path to cache file
+    '''
+    if cachedir is None:
+        return filepath + CACHE_SUFFIX
+    key = hashlib.md5( os.path.abspath( filepath ) ).hexdigest()
+    return os.path.join( cachedir, key + CACHE_SUFFIX )
+
+def source_stamp( filepath ):
+    ''' Size and mtime(microseconds) of filepath that a cache is keyed on '''
+    st = os.stat( filepath )
+    return (st.st_size, int( st.st_mtime * 1000000 ))
+
+def write_cache( path, filepath, seqaligns, columns ):
+    '''
+        Write the parsed contigs of filepath to path
+        The file is a sequence of .npy arrays: header, contigs and bases
+        Regions are not stored as they depend on the coverage policy
+
+        @param path - Cache file path
+        @param filepath - Path to the 454AlignmentInfo.tsv that was parsed
+        @param seqaligns - List of ColumnarSeqAlignment
+        @param columns - Column names to store
+        @return True if the cache was written or False if it could not be
+    '''
+    size, mtime = source_stamp( filepath )
+    header = np.array( [CACHE_VERSION, size, mtime], dtype=np.int64 )
+    namelen = max( [len( sa.name ) for sa in seqaligns] + [1] )
+    contigs = np.zeros( len( seqaligns ), dtype=[
+        ('name', 'S{}'.format( namelen )),
+        ('astart', np.int64),
+        ('lastpos', np.int64),
+        ('leadstart', np.int64),
+        ('leadend', np.int64),
+        ('nbases', np.int64),
+    ] )
+    for i, sa in enumerate( seqaligns ):
+        leadgap = sa.leadgap or (0, -1)
+        contigs[i] = (sa.name, sa.astart, sa.lastPos, leadgap[0], leadgap[1], len( sa ))
+    if seqaligns:
+        dtype = [(c, seqaligns[0].column( c ).dtype) for c in columns]
+    else:
+        dtype = np.int8
+    bases = np.zeros( contigs['nbases'].sum(), dtype=dtype )
+    row = 0
+    for sa in seqaligns:
+        for c in columns:
+            bases[c][row:row+len( sa )] = sa.column( c )
+        row += len( sa )
+
+    tmppath = path + '.tmp'
+    try:
+        with open( tmppath, 'wb' ) as fh:
+            for array in (header, contigs, bases):
+                np.save( fh, array )
+        os.rename( tmppath, path )
+    except (IOError, OSError):
+        if os.path.exists( tmppath ):
+            os.unlink( tmppath )
+        return False
+    return True
+
+def _memmap_array( fh, path ):
+    ''' Memory map the .npy array that starts at the current position of fh '''
+    version = np.lib.format.read_magic( fh )
+    if version == (1, 0):
+        shape, fortran, dtype = np.lib.format.read_array_header_1_0( fh )
+    else:
+        shape, fortran, dtype = np.lib.format.read_array_header_2_0( fh )
+    if not shape[0]:
+        return np.empty( shape, dtype=dtype )
+    return np.memmap( path, dtype=dtype, mode='r', offset=fh.tell(), shape=shape )
+
+def read_cache( path, filepath ):
+    '''
+        Load a cache written by write_cache if it is still valid for filepath
+        The bases are memory mapped and not read into memory
+
+        @param path - Cache file path
+        @param filepath - Path to the 454AlignmentInfo.tsv the cache is for
+        @return list of (name, astart, lastPos, leadgap, columns) where columns is a
+            dictionary of column name: array or None if the cache is missing or stale
+    '''
+    try:
+        with open( path, 'rb' ) as fh:
+            header = np.load( fh )
+            if header.tolist() != [CACHE_VERSION] + list( source_stamp( filepath ) ):
+                return None
+            contigs = np.load( fh )
+            bases = _memmap_array( fh, path )
+    except (IOError, OSError, ValueError):
+        return None
+
+    seqaligns = []
+    row = 0
+    for name, astart, lastpos, leadstart, leadend, nbases in contigs.tolist():
+        leadgap = None
+        if leadstart <= leadend:
+            leadgap = (leadstart, leadend)
+        columns = dict( (c, bases[c][row:row+nbases]) for c in bases.dtype.names or () )
+        seqaligns.append( (name, astart, lastpos, leadgap, columns) )
+        row += nbases
+    return seqaligns
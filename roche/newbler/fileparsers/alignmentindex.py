@@ -0,0 +1,138 @@
+###
+## Byte offset index of the > blocks in 454AlignmentInfo.tsv
+###
+
+import os
+import os.path
+
+from tokenizer import MappedFile, read_lines
+
+# Appended to the 454AlignmentInfo.tsv path to get the sidecar index path
+INDEX_SUFFIX = '.idx'
+
+class AlignmentIndex( object ):
+    '''
+        Index of every >name start header line in a 454AlignmentInfo.tsv and the
+        byte range of its block so a single reference can be read without parsing
+        the entire file.
+        The index is stored next to the file and is only reused if the size and
+        mtime of the file have not changed since it was written.
+    '''
+    def __init__( self, filepath, indexpath=None ):
+        '''
+            @param filepath - Path to 454AlignmentInfo.tsv
+            @param indexpath - Where to store the index. Defaults to filepath + INDEX_SUFFIX
+        '''
+        self.filepath = filepath
+        self.indexpath = indexpath
+        if self.indexpath is None:
+            self.indexpath = filepath + INDEX_SUFFIX
+        # List of (name, start, offset, end) in file order
+        self.entries = []
+        self._by_name = {}
+        if not self.load():
+            self.build()
+            self.save()
+
+    def stamp( self ):
+        ''' Size and mtime of the indexed file that the index is keyed on '''
+        st = os.stat( self.filepath )
+        return '{}\t{!r}'.format( st.st_size, st.st_mtime )
+
+    def add_entry( self, name, start, offset, end ):
+        self.entries.append( (name, start, offset, end) )
+        if name not in self._by_name:
+            self._by_name[name] = []
+        self._by_name[name].append( (offset, end) )
+
+    def build( self ):
+        ''' Scan the file for header lines and record their byte ranges '''
+        self.entries = []
+        self._by_name = {}
+        header = None
+        with MappedFile( self.filepath ) as mf:
+            data = mf.data
+            size = len( mf )
+            # Jump from header line to header line instead of reading every line
+            offset = next_header( data, 0 )
+            while offset != -1:
+                lineend = data.find( '\n', offset )
+                if lineend == -1:
+                    lineend = size
+                if header is not None:
+                    self.add_entry( header[0], header[1], header[2], offset )
+                name, start = data[offset:lineend].split()
+                header = (name[1:], int( start ), offset)
+                offset = next_header( data, lineend )
+        if header is not None:
+            self.add_entry( header[0], header[1], header[2], size )
+
+    def load( self ):
+        '''
+            Load the index from indexpath
+
+            @return True if the index was loaded or False if it is missing or stale
+        '''
+        try:
+            with open( self.indexpath ) as fh:
+                if fh.readline().rstrip( '\n' ) != '#' + self.stamp():
+                    return False
+                for line in fh:
+                    offset, end, start, name = line.rstrip( '\n' ).split( '\t' )
+                    self.add_entry( name, int( start ), int( offset ), int( end ) )
+        except (IOError, OSError, ValueError):
+            self.entries = []
+            self._by_name = {}
+            return False
+        return True
+
+    def save( self ):
+        '''
+            Write the index to indexpath
+            Failing to write(read only project directory) is not an error as the
+            index can still be used from memory
+        '''
+        try:
+            with open( self.indexpath, 'w' ) as fh:
+                fh.write( '#' + self.stamp() + '\n' )
+                for name, start, offset, end in self.entries:
+                    fh.write( '{}\t{}\t{}\t{}\n'.format( offset, end, start, name ) )
+        except (IOError, OSError):
+            return False
+        return True
+
+    def names( self ):
+        ''' Reference/contig names in the order they first appear '''
+        seen = set()
+        return [e[0] for e in self.entries if not (e[0] in seen or seen.add( e[0] ))]
+
+    def __contains__( self, name ):
+        return name in self._by_name
+
+    def __getitem__( self, name ):
+        ''' List of (offset, end) byte ranges for name '''
+        return self._by_name[name]
+
+    def read_blocks( self, name ):
+        '''
+            Read only the blocks for name
+
+            @param name - Reference/contig name
+            @return list of blocks where each block is a list of lines starting with the header line
+        '''
+        with MappedFile( self.filepath ) as mf:
+            return [read_lines( mf.data, offset, end ) for offset, end in self[name]]
+
+def next_header( data, offset ):
+    '''
+        Offset of the first > line that starts at or after offset or -1 if there is none
+
+        >>> next_header( '>a 1\\n1\\n>b 1\\n', 0 ), next_header( '>a 1\\n1\\n>b 1\\n', 1 )
+        (0, 7)
+    '''
+    if data[offset:offset+1] == '>' and (offset == 0 or data[offset-1:offset] == '\n'):
+        return offset
+    found = data.find( '\n>', offset )
+    if found == -1:
+        return -1
+    return found + 1
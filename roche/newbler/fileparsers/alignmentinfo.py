@@ -1,10 +1,40 @@
 import sys
+import os.path
+from bisect import bisect_right
+from multiprocessing import Pool
+
+import numpy as np
 
 from descriptors import (GreaterThanZeroFloat,
     GreaterThanZeroInt,
     GreaterThanEqualZeroFloat,
     GreaterThanEqualZeroInt,
-    Nucleotide)
+    Nucleotide,
+    VALID_BASES)
+from alignmentindex import AlignmentIndex
+from coverage import ReferenceTrack, RangeStats, DepthBinner, binned_depth, track_diff, \
+    homopolymer_flags
+from alignmentcache import cache_path, read_cache, write_cache
+from tokenizer import MappedFile, read_lines, split_fields, field_table, convert_column
+
+# Column layout of the base lines for mapping(-infoall) and assembly projects
+MAPPING_COLUMNS = ('pos','refb','consb','qual','udepth','adepth','tdepth','signal','stddev')
+ASSEMBLY_COLUMNS = ('pos','consb','qual','udepth','adepth','signal','stddev')
+# Storage type used for each column by ColumnarSeqAlignment
+COLUMN_DTYPES = {
+    'pos': np.int32,
+    'refb': 'S1',
+    'consb': 'S1',
+    'qual': np.int16,
+    'udepth': np.int32,
+    'adepth': np.int32,
+    'tdepth': np.int32,
+    'signal': np.float32,
+    'stddev': np.float32,
+}
+# Same as COLUMN_DTYPES but with values that convert back to exactly what
+# the file contains(used when building BaseInfo from the columns)
+EXACT_DTYPES = dict( COLUMN_DTYPES, signal=np.float64, stddev=np.float64 )
 
 class BadFormatException( Exception ):
     def __init__( self, error ):
@@ -14,8 +44,22 @@ class BadFormatException( Exception ):
 
 class AlignmentInfo(object):
     """ Parse 454AlignmentInfo.tsv """
-    def __init__( self, filepath ):
+    def __init__( self, filepath, columnar=False, lazy=False, workers=1, cache=False, policy=None ):
         """
+            @param filepath - Path to 454AlignmentInfo.tsv
+            @param columnar - Store each contig as typed numpy columns(ColumnarSeqAlignment)
+                instead of a BaseInfo object per line(SeqAlignment)
+            @param lazy - Do not parse the file until it is needed. Indexing by reference
+                name then only reads the blocks for that reference(see load_reference)
+            @param workers - Number of processes to parse the file with. The file is split
+                into byte ranges on > lines that are parsed in parallel
+            @param cache - Keep a binary cache of the parsed columns that is memory mapped
+                instead of parsing the file again as long as its size and mtime have not changed.
+                True stores the cache next to filepath or give a directory to store it in.
+                Requires columnar
+            @param policy - CoveragePolicy that decides which bases are low coverage.
+                Defaults to LowCoverageCalc.lowReadThreshold for every reference
+
         >>> ai = AlignmentInfo( 'examples/05_11_2012_1_TI-MID10_PR_2357_AH3/mapping/454AlignmentInfo.tsv' )
         >>> len( ai.seqs )
         37
@@ -28,42 +72,308 @@ class AlignmentInfo(object):
         """
         self._seqs = []
         self._refs = {}
-        self._parse( filepath )
+        self.filepath = filepath
+        self.columnar = columnar
+        self.workers = workers
+        if cache and not columnar:
+            raise ValueError( "cache requires columnar=True" )
+        self.cache = cache
+        self.policy = policy
+        self._index = None
+        self._loaded = False
+        # Per reference ReferenceTrack and RangeStats built on first use
+        self._tracks = {}
+        self._rangestats = {}
+        if not lazy:
+            self._load()
 
     def _parse( self, filepath ):
-        fh = open( filepath )
-        seqalign = None
-        lastPos = 0
-        for line in fh:
-            line = line.strip()
-            if line.startswith( 'Position' ):
-                # Skip the header of the file
-                continue
-            elif line.startswith( '>' ):
-                # Is beginning of a new contig in the alignment
-                # If previously had data then create SeqAlignment object
-                if seqalign:
-                    self.add_seq( SeqAlignment( seqalign ) )
-                seqalign = []
-                seqalign.append( line )
-            elif line[0] in "123456789":
-                # Line is a base information line
-                seqalign.append( line )
-            else:
-                raise BadFormatException( "%s has incorrect format in line %s" % 
-                    (filepath, line) )
-        # Indicates empty 454AlignmentInfo.tsv if seqalign is None
-        if seqalign is not None:
-            self.add_seq( SeqAlignment( seqalign ) )
-        fh.close()
+        if self.workers > 1:
+            seqaligns = parallel_alignments( filepath, self.workers, self.columnar, self.policy )
+        else:
+            seqaligns = iter_alignments( filepath, self.columnar, self.policy )
+        for seqalign in seqaligns:
+            self.add_seq( seqalign )
+        # Contigs were classified on their own so redo it over whole references
+        if self.coverage_policy.needs_reference:
+            self.apply_policy()
+
+    def _load( self ):
+        ''' Parse the entire file discarding anything loaded by load_reference '''
+        self._seqs = []
+        self._refs = {}
+        self._tracks = {}
+        self._rangestats = {}
+        self._loaded = True
+        if self.cache:
+            cachedir = None
+            if self.cache is not True:
+                cachedir = self.cache
+            cachefile = cache_path( self.filepath, cachedir )
+            if self._load_cache( cachefile ):
+                return
+        self._parse( self.filepath )
+        if self.cache:
+            self._write_cache( cachefile )
+
+    def _load_cache( self, cachefile ):
+        ''' Add the contigs from cachefile if it is valid and return if it was '''
+        cached = read_cache( cachefile, self.filepath )
+        if cached is None:
+            return False
+        for name, astart, lastpos, leadgap, columns in cached:
+            self.add_seq( ColumnarSeqAlignment.from_arrays( name, astart, lastpos, leadgap, columns, self.policy ) )
+        # Contigs were classified on their own so redo it over whole references
+        if self.coverage_policy.needs_reference:
+            self.apply_policy()
+        return True
+
+    def _write_cache( self, cachefile ):
+        # Only the columns that every contig has(assembly has no refb and tdepth)
+        columns = [c for c in MAPPING_COLUMNS
+            if all( sa.column( c ) is not None for sa in self._seqs )]
+        return write_cache( cachefile, self.filepath, self._seqs, columns )
+
+    def _ensure_loaded( self ):
+        if not self._loaded:
+            self._load()
 
     @property
     def seqs( self ):
+        self._ensure_loaded()
         return self._seqs
 
     def __getitem__( self, key ):
+        if not self._loaded:
+            return self.load_reference( key )
         return self._refs[key]
 
+    @property
+    def index( self ):
+        ''' AlignmentIndex of the file that is built or loaded on first use '''
+        if self._index is None:
+            self._index = AlignmentIndex( self.filepath )
+        return self._index
+
+    def load_reference( self, name ):
+        '''
+            Get the SeqAlignments for a single reference by seeking straight to its
+            blocks using the index instead of parsing the whole file
+
+            @param name - Reference/contig name
+            @return list of SeqAlignment for name
+        '''
+        if name in self._refs or self._loaded:
+            return self._refs[name]
+        if name not in self.index:
+            raise KeyError( name )
+        seqclass = seqalignment_class( self.columnar )
+        for block in self.index.read_blocks( name ):
+            for seqalign in iter_blocks( block, self.filepath ):
+                self.add_seq( seqclass( seqalign, policy=self.policy ) )
+        if self.coverage_policy.needs_reference:
+            self.apply_policy( refs=[name] )
+        return self._refs[name]
+
+    @property
+    def coverage_policy( self ):
+        ''' CoveragePolicy in use '''
+        if self.policy is None:
+            return DEFAULT_POLICY
+        return self.policy
+
+    def apply_policy( self, policy=None, refs=None ):
+        '''
+            Classify every base of the given references again with a policy that
+            sees all of a reference's depths at once and rebuild their regions
+
+            @param policy - CoveragePolicy to use from now on. Defaults to the current one
+            @param refs - Reference names to classify. Defaults to all loaded references
+        '''
+        if policy is not None:
+            self.policy = policy
+        policy = self.coverage_policy
+        if refs is None:
+            refs = list( self._refs )
+        for ref in refs:
+            sas = self._refs[ref]
+            adepth = [sa.column( 'adepth' ) for sa in sas]
+            qual = [sa.column( 'qual' ) for sa in sas]
+            lowmask = policy.classify( ref, np.concatenate( adepth ), np.concatenate( qual ) )
+            # Give each contig its own piece of the mask back
+            bounds = np.cumsum( [len( a ) for a in adepth] )[:-1]
+            for sa, mask in zip( sas, np.split( lowmask, bounds ) ):
+                sa.set_lowmask( mask )
+            self._tracks.pop( ref, None )
+            self._rangestats.pop( ref, None )
+
+    def track( self, ref ):
+        ''' ReferenceTrack of dense per position arrays for ref '''
+        if ref not in self._tracks:
+            self._tracks[ref] = ReferenceTrack( ref, self[ref] )
+        return self._tracks[ref]
+
+    def region_stats( self, ref, start, end, extremes=True ):
+        '''
+            Depth and quality statistics for a window of a reference in constant time
+            after the first query for that reference
+
+            @param ref - Reference name
+            @param start - First position of the window(1 based, inclusive)
+            @param end - Last position of the window(inclusive)
+            @param extremes - Also give min_depth and max_depth
+            @return dictionary with mean_depth, min_depth, max_depth, frac_low and mean_qual
+                (see RangeStats.query)
+        '''
+        if ref not in self._rangestats:
+            track = self.track( ref )
+            lowmask = self.coverage_policy.classify( ref, track.adepth, track.qual )
+            self._rangestats[ref] = RangeStats( track, lowmask )
+        return self._rangestats[ref].query( start, end, extremes )
+
+    def binned_depth( self, ref, bin_size ):
+        '''
+            Align depth of ref downsampled into bins of bin_size positions
+
+            @param ref - Reference name
+            @param bin_size - Number of positions in each bin
+            @return dictionary of start, end, mean, min and max arrays(see coverage.binned_depth)
+        '''
+        return binned_depth( self.track( ref ).adepth, bin_size )
+
+    def diff( self, other, min_depth_change=1 ):
+        '''
+            Compare the depth and consensus of every reference with another parse of
+            the same references(such as after mapping to updated references)
+
+            @param other - AlignmentInfo to compare against
+            @param min_depth_change - Depth has to change by at least this much to count
+            @return dictionary of reference name: changes(see coverage.track_diff) for
+                only the references that changed. A reference that only one of them has
+                is compared against an empty track
+        '''
+        changes = {}
+        refs = self.references()
+        refs += [ref for ref in other.references() if ref not in self._refs]
+        for ref in refs:
+            tracks = [ai.track( ref ) if ref in ai._refs else ReferenceTrack( ref, [] )
+                for ai in (self, other)]
+            change = track_diff( tracks[0], tracks[1], min_depth_change )
+            if change is not None:
+                changes[ref] = change
+        return changes
+
+    def homopolymer_flags( self, max_deviation=0.3, max_stddev=0.3 ):
+        '''
+            Screen every reference for likely homopolymer errors using the signal and
+            stddev columns of all of its base lines
+
+            @param max_deviation - Flag when the signal is further than this from the nearest
+                whole number
+            @param max_stddev - Flag when stddev is above this
+            @return dictionary of reference name: [(start, end)] for the references that
+                have flagged positions(see coverage.homopolymer_flags)
+        '''
+        flags = {}
+        for ref in self.references():
+            sas = self._refs[ref]
+            runs = homopolymer_flags(
+                np.concatenate( [sa.column( 'pos' ) for sa in sas] ),
+                np.concatenate( [sa.column( 'signal' ) for sa in sas] ),
+                np.concatenate( [sa.column( 'stddev' ) for sa in sas] ),
+                max_deviation, max_stddev )
+            if runs:
+                flags[ref] = runs
+        return flags
+
+    def references( self ):
+        ''' Reference names in the order they first appear '''
+        seen = set()
+        return [sa.name for sa in self.seqs if not (sa.name in seen or seen.add( sa.name ))]
+
+    def consensus( self, mask_below=None, mask_char='N', reference_coords=False ):
+        '''
+            Generator of the consensus(consb) sequence of every reference.
+            All base lines are used in file order so inserted bases are kept and
+            deletions(-) are left out. Positions that are not covered or are low
+            coverage are masked with a single mask_char
+
+            @param mask_below - Mask positions with an align depth below this.
+                Defaults to using coverage_policy
+            @param mask_char - Character to mask positions with
+            @param reference_coords - Give a sequence aligned to the reference with a
+                single character per position instead. Positions that have indels use
+                the first base line so deletions stay as - and insertions are dropped
+            @return generator of (reference name, consensus string)
+        '''
+        self._ensure_loaded()
+        for ref in self.references():
+            track = self.track( ref )
+            if mask_below is None:
+                lowmask = self.coverage_policy.classify( ref, track.adepth, track.qual )
+            else:
+                lowmask = track.adepth < mask_below
+            masked = lowmask | ~track.covered
+            if reference_coords:
+                consb = track.consb
+                if consb is None:
+                    consb = np.zeros( len( track ), dtype='S1' )
+                yield ref, np.where( masked, mask_char, consb ).astype( 'S1' ).tostring()
+            else:
+                yield ref, self._sequence( self[ref], masked, mask_char )
+
+    @staticmethod
+    def _sequence( seqaligns, masked, mask_char ):
+        '''
+            Consensus of every base line of seqaligns where masked positions are
+            a single mask_char and - are removed
+
+            @param seqaligns - SeqAlignments of a single reference in file order
+            @param masked - Boolean array that is True for positions(index i is
+                position i+1) to mask
+        '''
+        positions = []
+        bases = []
+        seen = np.zeros( len( masked ), dtype=bool )
+        for sa in seqaligns:
+            pos = sa.column( 'pos' )
+            consb = sa.column( 'consb' )
+            if not len( pos ) or consb is None:
+                continue
+            # Positions an earlier contig already gave are skipped(same as ReferenceTrack)
+            keep = ~seen[pos - 1]
+            seen[pos - 1] = True
+            keep &= ~masked[pos - 1] & (consb != '-')
+            positions.append( pos[keep] )
+            bases.append( consb[keep] )
+        maskpos = np.flatnonzero( masked ) + 1
+        positions.append( maskpos )
+        bases.append( np.array( [mask_char] * len( maskpos ), dtype='S1' ) )
+        positions = np.concatenate( positions )
+        # Stable so the base lines of a position stay in file order
+        order = np.argsort( positions, kind='mergesort' )
+        return np.concatenate( bases ).astype( 'S1' )[order].tostring()
+
+    def write_consensus( self, fh, mask_below=None, mask_char='N', width=60, reference_coords=False ):
+        '''
+            Write consensus to fh as FASTA one reference at a time
+
+            @param fh - File handle to write to
+            @param width - Number of bases per line(0 for the sequence on a single line)
+            (see consensus for the rest)
+            @return number of sequences written
+        '''
+        count = 0
+        for ref, seq in self.consensus( mask_below, mask_char, reference_coords ):
+            fh.write( '>' + ref + '\n' )
+            if width:
+                for i in range( 0, len( seq ), width ):
+                    fh.write( seq[i:i+width] + '\n' )
+            else:
+                fh.write( seq + '\n' )
+            count += 1
+        return count
+
     def get_last_seq_pos( self, name ):
         '''
             Gets last position of the last gt
@@ -76,60 +386,272 @@ class AlignmentInfo(object):
             return 0
 
     def add_seq( self, seqalign ):
-        self.seqs.append( seqalign )
-        name = self.seqs[-1].name
+        self._seqs.append( seqalign )
+        name = seqalign.name
         # If the identifier has already been seen
         # Keep track of which SeqAlignments are for what reference
         if name not in self._refs:
             self._refs[name] = []
-        self._refs[name].append( self.seqs[-1] )
+        self._refs[name].append( seqalign )
 
     def merge_regions( self ):
         """
             Merge all SeqAlignments with same name and return dictionary of Ref: [merged regions]
+            The regions of the SeqAlignments are not modified
         """
-        # Init the dict
-        refregions = {ref: None for ref in self._refs}
-
+        self._ensure_loaded()
+        refregions = {}
         for ref, sas in self._refs.iteritems():
-            regionsforref = []
-            mergedregions = []
-            for sa in sas:
-                [regionsforref.append( region ) for region in sa.regions]
-
-            regionsforref.sort()
-            # 0 or 1 regions for ref is easy
-            if len( regionsforref ) < 2:
-                refregions[ref] = regionsforref
-            # Merge all regions
-            else:
-                # Need to ensure sorted order for merging to work
-                # Use a counter so we can modify the list
-                for i in range( len( regionsforref ) - 1 ):
-                    try:
-                        # merge current and next region
-                        mregions = regionsforref[i].merge( regionsforref[i+1] )
-                    except ValueError as e:
-                        raise ValueError( "There was an error trying to merge" + \
-                            " regions for Reference {}. Error was: {}".format( ref, e ) )
-                    regionsforref[i+1] = mregions[-1]
-                    [mergedregions.append( region ) for region in mregions[:-1]]
-                mergedregions.append( regionsforref[ len( regionsforref ) - 1 ] )
-
-                refregions[ref] = mergedregions
+            refregions[ref] = sweep_regions( [region for sa in sas for region in sa.regions] )
         return refregions
 
+class AlignmentInfoFollower( AlignmentInfo ):
+    '''
+        Follows a 454AlignmentInfo.tsv that is still being written(such as during runProject).
+        Every poll only parses the blocks that were appended since the last poll so
+        seqs, merge_regions, track and so on show the coverage of everything so far.
+        A block is only complete once the next > line is written so the last block
+        is left until finish is called
+    '''
+    def __init__( self, filepath, columnar=False, policy=None ):
+        '''
+            @param filepath - Path to 454AlignmentInfo.tsv. It does not have to exist yet
+            @param columnar - Store each contig as a ColumnarSeqAlignment
+            @param policy - CoveragePolicy(see AlignmentInfo)
+        '''
+        super( AlignmentInfoFollower, self ).__init__( filepath, columnar, lazy=True, policy=policy )
+        self._reset()
+
+    def _reset( self ):
+        self._seqs = []
+        self._refs = {}
+        self._tracks = {}
+        self._rangestats = {}
+        # Everything that has been parsed counts as loaded
+        self._loaded = True
+        # Byte offset in the file that has been parsed up to
+        self.offset = 0
+
+    def _load( self ):
+        self.finish()
+
+    def poll( self, final=False ):
+        '''
+            Parse the complete blocks that were appended since the last poll
+
+            @param final - The file is done being written so parse the last block too
+            @return list of the new SeqAlignments
+        '''
+        if not os.path.exists( self.filepath ):
+            return []
+        if os.path.getsize( self.filepath ) < self.offset:
+            # File was started over
+            self._reset()
+        with MappedFile( self.filepath ) as mf:
+            if final:
+                end = len( mf )
+            else:
+                # Everything up to the start of the last > line
+                end = mf.data.rfind( '\n>', self.offset ) + 1
+            if end <= self.offset:
+                return []
+            lines = read_lines( mf.data, self.offset, end )
+        seqclass = seqalignment_class( self.columnar )
+        new = [seqclass( seqalign, policy=self.policy )
+            for seqalign in iter_blocks( lines, self.filepath )]
+        self.offset = end
+        refs = set()
+        for seqalign in new:
+            self.add_seq( seqalign )
+            refs.add( seqalign.name )
+        for ref in refs:
+            self._tracks.pop( ref, None )
+            self._rangestats.pop( ref, None )
+        if refs and self.coverage_policy.needs_reference:
+            self.apply_policy( refs=list( refs ) )
+        return new
+
+    def finish( self ):
+        ''' Parse everything that is left once the file is done being written '''
+        return self.poll( final=True )
+
+def sweep_regions( regions ):
+    '''
+        Merge any number of overlapping regions in a single sweep over their sorted
+        start/end points. Where regions overlap the region type with the highest
+        precedence wins(Normal > LowCoverage > Gap) and adjacent regions of the same
+        type are joined. Positions that no region covers are left out.
+
+        @param regions - Iterable of CoverageRegion
+        @return new sorted list of CoverageRegion
+    '''
+    # Position -> list of (region type value, +1 for region start or -1 for region end)
+    events = {}
+    for region in regions:
+        if region.start > region.end:
+            continue
+        events.setdefault( region.start, [] ).append( (region.rtypev, 1) )
+        events.setdefault( region.end + 1, [] ).append( (region.rtypev, -1) )
+
+    rtypes = sorted( CoverageRegion._regionTypes.items(), key=lambda t: t[1], reverse=True )
+    # How many regions of each type cover the current position
+    active = dict( (v, 0) for t, v in rtypes )
+    points = sorted( events )
+    merged = []
+    for i, point in enumerate( points[:-1] ):
+        for rtypev, change in events[point]:
+            active[rtypev] += change
+        covering = [t for t, v in rtypes if active[v]]
+        if not covering:
+            continue
+        end = points[i+1] - 1
+        if merged and merged[-1].rtype == covering[0] and merged[-1].end + 1 == point:
+            merged[-1].end = end
+        else:
+            merged.append( CoverageRegion( point, end, covering[0] ) )
+    return merged
+
+def iter_blocks( lines, filepath ):
+    '''
+        Group lines of a 454AlignmentInfo.tsv into contig blocks
+
+        @param lines - Iterable of lines from the file
+        @param filepath - Path of the file for error messages
+        @return generator of lists of lines, each starting with the >name start line
+    '''
+    seqalign = None
+    for line in lines:
+        line = line.strip()
+        if line.startswith( 'Position' ):
+            # Skip the header of the file
+            continue
+        elif line.startswith( '>' ):
+            # Is beginning of a new contig in the alignment
+            # so the previous one is complete
+            if seqalign:
+                yield seqalign
+            seqalign = [line]
+        elif line[0] in "123456789":
+            # Line is a base information line
+            seqalign.append( line )
+        else:
+            raise BadFormatException( "%s has incorrect format in line %s" % 
+                (filepath, line) )
+    # Indicates empty 454AlignmentInfo.tsv if seqalign is None
+    if seqalign is not None:
+        yield seqalign
+
+def seqalignment_class( columnar ):
+    ''' Class used to store each contig '''
+    if columnar:
+        return ColumnarSeqAlignment
+    return SeqAlignment
+
+def iter_alignments( filepath, columnar=False, policy=None ):
+    '''
+        Generator that yields each contig of a 454AlignmentInfo.tsv as soon as
+        its > block has been read so the whole file never has to be in memory
+
+        @param filepath - Path to 454AlignmentInfo.tsv
+        @param columnar - Yield ColumnarSeqAlignment instead of SeqAlignment
+        @param policy - CoveragePolicy to classify each contig with. Policies that
+            need the whole reference only see the contig(see AlignmentInfo.apply_policy)
+        @return generator of SeqAlignment/ColumnarSeqAlignment in file order
+    '''
+    seqclass = seqalignment_class( columnar )
+    with MappedFile( filepath ) as mf:
+        for seqalign in iter_blocks( mf.lines(), filepath ):
+            yield seqclass( seqalign, policy=policy )
+
+def iter_binned_depth( filepath, bin_size ):
+    '''
+        Generator of the binned align depth of every reference in a 454AlignmentInfo.tsv
+        that only keeps a single contig and the bins of a single reference in memory.
+        The contigs of a reference are together in the file so each reference is
+        yielded as soon as the next one starts
+
+        @param filepath - Path to 454AlignmentInfo.tsv
+        @param bin_size - Number of positions in each bin
+        @return generator of (reference name, bins) where bins is the same as
+            AlignmentInfo.binned_depth
+    '''
+    ref = None
+    binner = None
+    for seqalign in iter_alignments( filepath, columnar=True ):
+        if seqalign.name != ref:
+            if ref is not None:
+                yield ref, binner.bins()
+            ref = seqalign.name
+            binner = DepthBinner( bin_size )
+        binner.add( seqalign.pos, seqalign.adepth )
+    if ref is not None:
+        yield ref, binner.bins()
+
+def split_ranges( filepath, parts ):
+    '''
+        Split a 454AlignmentInfo.tsv into byte ranges that each start on a > line
+        so every range can be parsed on its own
+
+        @param filepath - Path to 454AlignmentInfo.tsv
+        @param parts - Number of ranges wanted. Less are returned for small files
+        @return list of (start, end) byte offsets in file order
+    '''
+    bounds = [0]
+    with MappedFile( filepath ) as mf:
+        size = len( mf )
+        for i in range( 1, parts ):
+            # First > line that starts after the split point
+            offset = mf.data.find( '\n>', max( size * i // parts - 1, 0 ) ) + 1
+            if bounds[-1] < offset < size:
+                bounds.append( offset )
+    return zip( bounds, bounds[1:] + [size] )
+
+def _parse_range( args ):
+    ''' Parse the blocks in a byte range of a file(used by parallel_alignments) '''
+    filepath, start, end, columnar, policy = args
+    seqclass = seqalignment_class( columnar )
+    with MappedFile( filepath ) as mf:
+        lines = read_lines( mf.data, start, end )
+    return [seqclass( seqalign, policy=policy ) for seqalign in iter_blocks( lines, filepath )]
+
+def parallel_alignments( filepath, workers, columnar=False, policy=None ):
+    '''
+        Parse a 454AlignmentInfo.tsv with a pool of processes
+
+        @param filepath - Path to 454AlignmentInfo.tsv
+        @param workers - Number of processes
+        @param columnar - Return ColumnarSeqAlignment instead of SeqAlignment
+        @param policy - CoveragePolicy to classify each contig with(see iter_alignments)
+        @return list of SeqAlignment/ColumnarSeqAlignment in file order
+    '''
+    # A few ranges per worker so one slow range does not hold up the rest
+    tasks = [(filepath, start, end, columnar, policy) for start, end in split_ranges( filepath, workers * 4 )]
+    pool = Pool( workers )
+    try:
+        results = pool.map( _parse_range, tasks )
+    finally:
+        pool.close()
+        pool.join()
+    return [seqalign for result in results for seqalign in result]
+
 class SeqAlignment( object ):
     """ Represents a single sequence alignment """
-    def __init__( self, seqalignment, lastPos = 0 ):
+    def __init__( self, seqalignment, lastPos = 0, policy = None ):
         '''
             @param lastPos - Last position of the previous SeqAlignment
+            @param policy - CoveragePolicy that classifies the bases. Defaults to DEFAULT_POLICY
         '''
         if len( seqalignment ) == 0:
             raise ValueError( "No sequence alignment given" )
-        self.bases = []
-        # Store the bases at their actual position
-        self._actual_bases = {}
+        self.bases = BaseList()
+        # Bases that came from the file in the order they were added and their positions
+        self._real = []
+        self._pos = []
+        # Sorted unique positions and the index in _real of the first base of each
+        # plus a final end offset(built by _position_index when needed)
+        self._positions = None
+        self._offsets = None
+        self._order = None
         self.regions = []
         # Splits the id line on all space characters(so if they accidentally
         # put a spacetab it will cut both of them out FYI)
@@ -137,78 +659,431 @@ class SeqAlignment( object ):
         self.name = self.name[1:]
         self.astart = int( self.astart )
         self.lastPos = lastPos + 1
+        # First position this contig covers including its leading gap
+        self.first = self.lastPos
+        self.policy = policy or DEFAULT_POLICY
         if len( seqalignment ) > 1:
             self._parse( seqalignment[1:] )
 
+    def _position_index( self ):
+        '''
+            Build the index of positions into _real. Indels share a position so
+            every position has a range of bases instead of a single one
+        '''
+        pos = np.array( self._pos, dtype=np.int64 )
+        self._order = None
+        if len( pos ) and (np.diff( pos ) < 0).any():
+            # Only bases added out of position order need a sort
+            self._order = np.argsort( pos, kind='mergesort' )
+            pos = pos[self._order]
+        self._positions, first = np.unique( pos, return_index=True )
+        self._offsets = np.append( first, len( pos ) )
+
     def __getitem__( self, key ):
-        return self._actual_bases[key]
+        ''' Returns list of BaseInfo that are at position key '''
+        if self._offsets is None or self._offsets[-1] != len( self._real ):
+            self._position_index()
+        i = np.searchsorted( self._positions, key )
+        if i < len( self._positions ) and self._positions[i] == key:
+            indexes = range( self._offsets[i], self._offsets[i+1] )
+            if self._order is not None:
+                indexes = self._order[indexes].tolist()
+            return [self._real[j] for j in indexes]
+        # Gap positions only get a base when they are asked for
+        gap = self.bases.gap_at( key )
+        if gap is not None:
+            return [gap.base( key - gap.start )]
+        raise KeyError( key )
+
+    def column( self, name ):
+        '''
+            Return a numpy array of the attribute name(such as adepth) of every base
+            that came from the file or None if the bases do not have that attribute
+        '''
+        values = []
+        for base in self._real:
+            if not hasattr( base, name ):
+                return None
+            values.append( getattr( base, name ) )
+        return np.array( values, dtype=COLUMN_DTYPES[name] )
 
     def add_base( self, base ):
         ''' Add a base to alignment '''
         self.bases.append( base )
-        if self._actual_bases.get( base.pos, None ) is None:
-            self._actual_bases[base.pos] = []
-        self._actual_bases[base.pos].append( base )
+        self._real.append( base )
+        self._pos.append( base.pos )
 
     def create_coverage_region( self, start, end, rType ):
         '''
-            Create bases starting at start and ending on end(inclusive) with rtype
+            Add gap bases starting at start and ending on end(inclusive) and return
+            a region with rtype. The gap bases are stored as a GapRange
             
             @param start - Starting base position for coverage region(inclusive)
             @param end - Ending base position(inclusive)
             @param rtype - CoverageRegion rType
         '''
-        [self.add_base( BaseInfo.static_base( i, rType ) ) \
-            for i in range( start, end+1 )]
+        self.bases.add_gap( start, end )
         return CoverageRegion( start, end, rType )
 
     def _parse( self, seqalignment ):
-        # Create coverage region for beginning
-        # and add gap bases
+        # Add gap bases from last position of last seqalign up to but
+        # not including the start of this seqalign
         if self.lastPos != self.astart:
-            # from last position of last seqalign up to but 
-            # not including the start of this seqalign
-            self.regions.append( self.create_coverage_region( 
-                self.lastPos, self.astart-1, 'Gap' ) )
+            self.create_coverage_region( self.lastPos, self.astart-1, 'Gap' )
 
-        # Start a new region beginning with the first base
-        basei = BaseInfo( seqalignment[0] )
+        # Validate all the lines at once and then skip validating every field
+        columns = parse_columns( seqalignment, EXACT_DTYPES )
+        values = [columns[name].tolist() if name in columns else [None] * len( seqalignment )
+            for name in MAPPING_COLUMNS]
+        # Classify the whole contig at once instead of every BaseInfo on its own
+        lowmask = self.policy.classify( self.name, columns['adepth'], columns['qual'] )
+        values.append( [gap_type( low ) for low in lowmask.tolist()] )
+        parsed = [BaseInfo.from_fields( *fields ) for fields in zip( *values )]
         # Set last seen position as we are parsing the sequence lines now
-        self.lastPos = basei.pos - 1
-        self.regions.append( CoverageRegion( basei.pos, basei.pos, basei.gapType ) )
-
-        # Loop through all the alignment lines
-        for line in seqalignment:
-            basei = BaseInfo( line )
+        self.lastPos = parsed[0].pos - 1
+        for basei in parsed:
             # Homopolomer or indel
             if basei.pos == self.lastPos:
-                # Just set last pos so no gap while loop
                 self.lastPos = basei.pos - 1
             # Insert gap bases
-            if self.lastPos + 1 != basei.pos:
-                # End old region
-                self.regions[-1].end = self.lastPos
-                # Start new gap region
-                self.regions.append( CoverageRegion( self.lastPos + 1, 
-                    self.lastPos + 1, 'Gap' ) )
-                while self.lastPos + 1 != basei.pos:
-                    self.lastPos += 1
-                    self.bases.append( BaseInfo.gapBase( self.lastPos ) )
-                # End gap region
-                self.regions[-1].end = self.lastPos
-                # Start new region
-                self.regions.append( CoverageRegion( basei.pos, basei.pos, basei.gapType ) )
-
-            # This base has different region type than current region
-            if basei.gapType != self.regions[-1].rtype:
-                self.regions[-1].end = self.lastPos
-                self.regions.append( CoverageRegion( basei.pos, basei.pos, basei.gapType ) )
-
+            if self.lastPos + 1 < basei.pos:
+                self.bases.add_gap( self.lastPos + 1, basei.pos - 1 )
             self.add_base( basei )
             self.lastPos = basei.pos
 
-        # end current region
-        self.regions[-1].end = self.lastPos
+        self.regions = segment_regions( columns['pos'], lowmask, self.first, self.astart )
+
+    def set_lowmask( self, lowmask ):
+        '''
+            Reclassify the bases and rebuild the regions
+
+            @param lowmask - Boolean array with an entry for every base line that is True
+                where the base is low coverage
+        '''
+        for base, low in zip( self._real, np.asarray( lowmask ).tolist() ):
+            base.gapType = gap_type( low )
+        self.regions = segment_regions( self._pos, lowmask, self.first, self.astart )
+
+class ColumnarSeqAlignment( object ):
+    """
+        Represents a single sequence alignment with each column stored as a typed
+        numpy array(see COLUMN_DTYPES) instead of a BaseInfo object per line.
+        Assembly alignments do not have the refb and tdepth columns so they are None
+    """
+    def __init__( self, seqalignment, lastPos = 0, policy = None ):
+        '''
+            @param lastPos - Last position of the previous SeqAlignment
+            @param policy - CoveragePolicy that classifies the bases. Defaults to DEFAULT_POLICY
+        '''
+        if len( seqalignment ) == 0:
+            raise ValueError( "No sequence alignment given" )
+        self.regions = []
+        self.name, self.astart = seqalignment[0].split()
+        self.name = self.name[1:]
+        self.astart = int( self.astart )
+        self.lastPos = lastPos + 1
+        self.first = self.lastPos
+        self.policy = policy or DEFAULT_POLICY
+        # Positions of the leading gap(inclusive) if there is one
+        self.leadgap = None
+        # True for the base lines that are low coverage
+        self.lowmask = np.zeros( 0, dtype=bool )
+        self._set_columns( parse_columns( seqalignment[1:] ) )
+        if len( seqalignment ) > 1:
+            self._parse()
+
+    @classmethod
+    def from_arrays( cls, name, astart, lastPos, leadgap, columns, policy=None ):
+        '''
+            Create from already parsed values(such as from an alignmentcache)
+            The regions are built from the columns with policy
+
+            @param leadgap - (start, end) of the leading gap or None
+            @param columns - dictionary of column name: array
+            @param policy - CoveragePolicy that classifies the bases. Defaults to DEFAULT_POLICY
+        '''
+        csa = cls.__new__( cls )
+        csa.name = name
+        csa.astart = astart
+        csa.lastPos = lastPos
+        csa.leadgap = leadgap
+        csa.first = astart
+        if leadgap is not None:
+            csa.first = leadgap[0]
+        csa.policy = policy or DEFAULT_POLICY
+        csa._set_columns( columns )
+        csa.set_lowmask( csa.policy.classify( name, csa.adepth, csa.qual ) )
+        return csa
+
+    def _set_columns( self, columns ):
+        ''' Set every column as an attribute. Missing columns are set to None '''
+        self.columnnames = tuple( name for name in MAPPING_COLUMNS if name in columns )
+        for name in MAPPING_COLUMNS:
+            setattr( self, name, columns.get( name ) )
+
+    @property
+    def ismapping( self ):
+        return self.refb is not None
+
+    def __len__( self ):
+        ''' Number of base lines(not including gap positions) '''
+        return len( self.pos )
+
+    def column( self, name ):
+        ''' Return the array for a column name such as adepth '''
+        return getattr( self, name )
+
+    def base( self, i ):
+        ''' Materialize the i'th base line as a BaseInfo '''
+        fields = []
+        for name in MAPPING_COLUMNS:
+            column = getattr( self, name )
+            if column is None:
+                fields.append( None )
+            elif column.dtype.kind == 'f':
+                # Shortest float32 representation is what the file contains
+                fields.append( float( str( column[i] ) ) )
+            else:
+                fields.append( column[i].item() )
+        return BaseInfo.from_fields( *fields, gapType=gap_type( self.lowmask[i] ) )
+
+    @property
+    def bases( self ):
+        '''
+            Materialize the same BaseList that SeqAlignment.bases contains
+            This is expensive and only here for compatibility
+        '''
+        bases = BaseList()
+        if self.leadgap is not None:
+            bases.add_gap( *self.leadgap )
+        lastpos = None
+        for i in range( len( self ) ):
+            pos = int( self.pos[i] )
+            if lastpos is not None and pos > lastpos + 1:
+                bases.add_gap( lastpos + 1, pos - 1 )
+            bases.append( self.base( i ) )
+            lastpos = pos
+        return bases
+
+    def __getitem__( self, key ):
+        ''' Returns list of BaseInfo that are at position key '''
+        if self.leadgap is not None and self.leadgap[0] <= key <= self.leadgap[1]:
+            return [BaseInfo.gapBase( key )]
+        left = np.searchsorted( self.pos, key, 'left' )
+        right = np.searchsorted( self.pos, key, 'right' )
+        if left == right:
+            # Not a base line but inside the contig so it is a gap position
+            if len( self ) and self.pos[0] < key < self.pos[-1]:
+                return [BaseInfo.gapBase( key )]
+            raise KeyError( key )
+        return [self.base( i ) for i in range( left, right )]
+
+    def _parse( self ):
+        # Gap from the last position of the last seqalign up to but
+        # not including the start of this seqalign
+        if self.lastPos != self.astart:
+            self.leadgap = (self.lastPos, self.astart - 1)
+        self.lowmask = self.policy.classify( self.name, self.adepth, self.qual )
+        self.regions = segment_regions( self.pos, self.lowmask, self.first, self.astart )
+        self.lastPos = int( self.pos[-1] )
+
+    def set_lowmask( self, lowmask ):
+        '''
+            Reclassify the bases and rebuild the regions
+
+            @param lowmask - Boolean array with an entry for every base line that is True
+                where the base is low coverage
+        '''
+        self.lowmask = np.asarray( lowmask, dtype=bool )
+        self.regions = segment_regions( self.pos, lowmask, self.first, self.astart )
+
+class GapRange( object ):
+    ''' Positions start through end(inclusive) that have no bases '''
+    __slots__ = ('start', 'end')
+    def __init__( self, start, end ):
+        self.start = start
+        self.end = end
+
+    def __len__( self ):
+        return max( 0, self.end - self.start + 1 )
+
+    def __contains__( self, pos ):
+        return self.start <= pos <= self.end
+
+    def base( self, i ):
+        ''' Virtual gap base for the i'th position of the range '''
+        return BaseInfo.gapBase( self.start + i )
+
+    def __repr__( self ):
+        return "GapRange( %s, %s )" % (self.start, self.end)
+
+class BaseList( object ):
+    '''
+        Sequence of the BaseInfo in a SeqAlignment where stretches of gap bases are
+        stored as GapRange and only created when they are indexed or iterated over
+    '''
+    def __init__( self ):
+        # Each chunk is either a list of BaseInfo or a GapRange
+        self._chunks = []
+        # Index of the first base of each chunk
+        self._offsets = []
+        # GapRanges sorted by start position and their starts for bisect
+        self._gaps = []
+        self._gap_starts = []
+        self._len = 0
+
+    def append( self, base ):
+        if not self._chunks or isinstance( self._chunks[-1], GapRange ):
+            self._chunks.append( [] )
+            self._offsets.append( self._len )
+        self._chunks[-1].append( base )
+        self._len += 1
+
+    def add_gap( self, start, end ):
+        ''' Add gap bases for positions start through end(inclusive) '''
+        gap = GapRange( start, end )
+        if len( gap ):
+            self._chunks.append( gap )
+            self._offsets.append( self._len )
+            self._len += len( gap )
+            i = bisect_right( self._gap_starts, start )
+            self._gap_starts.insert( i, start )
+            self._gaps.insert( i, gap )
+        return gap
+
+    @property
+    def gaps( self ):
+        return [chunk for chunk in self._chunks if isinstance( chunk, GapRange )]
+
+    def gap_at( self, pos ):
+        ''' GapRange that contains position pos or None '''
+        i = bisect_right( self._gap_starts, pos ) - 1
+        if i >= 0 and pos in self._gaps[i]:
+            return self._gaps[i]
+        return None
+
+    def real_bases( self ):
+        ''' Iterate only over the bases that came from the file '''
+        for chunk in self._chunks:
+            if not isinstance( chunk, GapRange ):
+                for base in chunk:
+                    yield base
+
+    def __len__( self ):
+        return self._len
+
+    def __iter__( self ):
+        for chunk in self._chunks:
+            if isinstance( chunk, GapRange ):
+                for i in range( len( chunk ) ):
+                    yield chunk.base( i )
+            else:
+                for base in chunk:
+                    yield base
+
+    def __getitem__( self, index ):
+        if isinstance( index, slice ):
+            return [self[i] for i in range( *index.indices( self._len ) )]
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError( "BaseList index out of range" )
+        c = bisect_right( self._offsets, index ) - 1
+        chunk = self._chunks[c]
+        if isinstance( chunk, GapRange ):
+            return chunk.base( index - self._offsets[c] )
+        return chunk[index - self._offsets[c]]
+
+def segment_regions( pos, lowmask, first, astart ):
+    '''
+        Build the CoverageRegions of a single contig in one vectorized pass by
+        run length encoding the low coverage mask together with the position gaps
+
+        @param pos - Array of base positions in file order(duplicates for indels are allowed)
+        @param lowmask - Boolean array that is True where the base is low coverage
+        @param first - First position this contig covers(last position of previous contig + 1)
+        @param astart - Start position from the contig's > line
+        @return list of CoverageRegion
+    '''
+    regions = []
+    if first != astart:
+        regions.append( CoverageRegion( first, astart - 1, 'Gap' ) )
+    pos = np.asarray( pos, dtype=np.int64 )
+    lowmask = np.asarray( lowmask, dtype=bool )
+    if len( pos ) == 0:
+        return regions
+    step = np.diff( pos )
+    if (step < 0).any():
+        raise BadFormatException( "Base positions are not in ascending order" )
+    # A region ends wherever there is a gap or the coverage type changes
+    gaps = step > 1
+    breaks = np.flatnonzero( gaps | (lowmask[1:] != lowmask[:-1]) ) + 1
+    startsi = np.concatenate( ([0], breaks) )
+    ends = np.empty( len( startsi ), dtype=np.int64 )
+    # Regions before a gap end on their last base. Otherwise they end right before
+    # the next region which also covers indels that share a position
+    ends[:-1] = np.where( gaps[breaks-1], pos[breaks-1], pos[breaks] - 1 )
+    ends[-1] = pos[-1]
+    # Whether a gap follows each region
+    gapafter = np.concatenate( (gaps[breaks-1], [False]) )
+    nextstart = np.concatenate( (pos[breaks], [0]) )
+    for start, end, low, gap, nstart in zip( pos[startsi].tolist(), ends.tolist(),
+            lowmask[startsi].tolist(), gapafter.tolist(), nextstart.tolist() ):
+        regions.append( CoverageRegion( start, end, gap_type( low ) ) )
+        if gap:
+            regions.append( CoverageRegion( end + 1, nstart - 1, 'Gap' ) )
+    return regions
+
+def gap_type( islow ):
+    ''' Region type for a base that is low coverage or not '''
+    if islow:
+        return 'LowCoverage'
+    return 'Normal'
+
+def parse_columns( lines, dtypes=COLUMN_DTYPES ):
+    '''
+        Parse base lines into a dictionary of typed numpy arrays keyed by column name
+        All lines are validated at once instead of per value
+
+        @param lines - List of tab separated base lines from 454AlignmentInfo.tsv
+        @param dtypes - dictionary of column name: numpy dtype
+        @return dictionary of column name: numpy array
+    '''
+    if not lines:
+        return dict( (name, np.empty( 0, dtypes[name] )) for name in MAPPING_COLUMNS )
+    rows = split_fields( [line.rstrip( '\n' ) for line in lines] )
+    alen = len( rows[0] )
+    if alen == 9:
+        names = MAPPING_COLUMNS
+    elif alen == 7:
+        names = ASSEMBLY_COLUMNS
+    else:
+        raise BadFormatException( "Incorrect amount of columns in %s" % lines[0] )
+    for row, line in zip( rows, lines ):
+        if len( row ) != alen:
+            raise BadFormatException( "Incorrect amount of columns in %s" % line )
+    table = field_table( rows )
+
+    columns = {}
+    for i, name in enumerate( names ):
+        if name in ('refb','consb'):
+            col = table[:,i]
+            invalid = ~np.in1d( col, VALID_BASES )
+            if invalid.any():
+                raise ValueError( "{} is not a valid value. Not in {}".format( col[invalid][0], VALID_BASES ) )
+        try:
+            col = convert_column( table, i, dtypes[name] )
+        except ValueError as e:
+            raise ValueError( "Invalid value in column {}: {}".format( name, e ) )
+        columns[name] = col
+    if (columns['pos'] <= 0).any():
+        raise ValueError( "Column pos has values that are not greater than zero" )
+    for name in names:
+        if name in ('pos','refb','consb'):
+            continue
+        if (columns[name] < 0).any():
+            raise ValueError( "Column {} has values that are not greater than or equal to zero".format( name ) )
+    return columns
 
 class CoverageRegion( object ):
     """ Store information about a region """
@@ -345,7 +1220,12 @@ class CoverageRegion( object ):
         #    and self.end > other.end:
         #    return 1
 
-class BaseInfo( object ):
+class BaseInfoBase( object ):
+    """
+        Everything BaseInfo and SlottedBaseInfo have in common
+        Values are stored under _<name> by the descriptors
+    """
+    __slots__ = ()
     _gapTypes = {'Gap': -1, 'LowCoverage': 0, 'Normal': 1}
     pos = GreaterThanZeroInt( 'pos' )
     qual = GreaterThanEqualZeroInt( 'qual' )
@@ -357,24 +1237,53 @@ class BaseInfo( object ):
     refb = Nucleotide( 'refb' )
     consb = Nucleotide( 'consb' )
 
-    @staticmethod
-    def gapBase( pos ):
-        return BaseInfo.static_base( pos, 'Gap' )
+    @classmethod
+    def gapBase( cls, pos ):
+        return cls.static_base( pos, 'Gap' )
 
-    @staticmethod
-    def static_base( pos, gapType ):
+    @classmethod
+    def static_base( cls, pos, gapType ):
         ''' Returns a static base(usually used as a filler) '''
-        bi = BaseInfo( "%s\t-\t-\t64\t1\t1000\t1000\t0.0\t0.0" % pos )
-        bi.gapType = 'Gap'
+        return cls.from_fields( pos, '-', '-', 64, 1, 1000, 1000, 0.0, 0.0, 'Gap' )
+
+    @classmethod
+    def from_fields( cls, pos, refb, consb, qual, udepth, adepth, tdepth, signal, stddev,
+            gapType=None, lowcovcalc=None ):
+        '''
+            Trusted constructor that skips the per field validation of the descriptors
+            Only use with values that were already validated(such as by parse_columns)
+            and converted to int/float/str
+
+            @param refb, tdepth - None for assembly bases
+            @param gapType - Determined by lowcovcalc if not given
+        '''
+        bi = cls.__new__( cls )
+        bi.lcc = lowcovcalc or LowCoverageCalc
+        bi._pos = pos
+        bi._consb = consb
+        bi._qual = qual
+        bi._udepth = udepth
+        bi._adepth = adepth
+        bi._signal = signal
+        bi._stddev = stddev
+        if refb is not None:
+            bi._refb = refb
+        if tdepth is not None:
+            bi._tdepth = tdepth
+        if gapType is None:
+            gapType = 'Normal'
+            if bi.lcc.isLowCoverage( bi ):
+                gapType = 'LowCoverage'
+        bi._gapType = gapType
         return bi
 
-    """ Represents a single base in an alignment """
     def __init__( self, seqalignline, lowcovcalc = None ):
         """
             Can feed whole line split up or just the line as a whole
         """
         if lowcovcalc is None:
-            self.lcc = LowCoverageCalc
+            lowcovcalc = LowCoverageCalc
+        self.lcc = lowcovcalc
 
         self.parse_line( seqalignline )
 
@@ -420,10 +1329,21 @@ class BaseInfo( object ):
 
     def __str__( self ):
         if hasattr( self, 'refb' ):
-            out = '{_pos}\t{_refb}\t{_consb}\t{_qual}\t{_udepth}\t{_adepth}\t{_tdepth}\t{_signal}\t{_stddev}'
+            names = MAPPING_COLUMNS
         else:
-            out = '{_pos}\t{_consb}\t{_qual}\t{_udepth}\t{_adepth}\t{_signal}\t{_stddev}'
-        return out.format( **self.__dict__ )
+            names = ASSEMBLY_COLUMNS
+        return '\t'.join( '{}'.format( getattr( self, '_' + name ) ) for name in names )
+
+class BaseInfo( BaseInfoBase ):
+    """ Represents a single base in an alignment """
+
+class SlottedBaseInfo( BaseInfoBase ):
+    """
+        BaseInfo without a per instance __dict__ which makes each base much smaller
+        Arbitrary attributes cannot be set on it
+    """
+    __slots__ = ('_pos', '_refb', '_consb', '_qual', '_udepth', '_adepth', '_tdepth',
+        '_signal', '_stddev', '_gapType', 'lcc')
 
 class LowCoverageCalc( object ):
     # Less than these numbers
@@ -444,6 +1364,104 @@ class LowCoverageCalc( object ):
         else:
             return False
 
+class CoveragePolicy( object ):
+    """
+        Decides which bases of a reference are low coverage for a whole array of
+        depths at once instead of calling LowCoverageCalc for every BaseInfo
+    """
+    # True if the policy has to see every base of a reference(such as for its median)
+    # so classifying a single contig on its own is not enough
+    needs_reference = False
+
+    def threshold( self, ref, adepth ):
+        '''
+            @param ref - Reference name
+            @param adepth - Array of align depths of ref
+            @return align depth that is low coverage when below it
+        '''
+        raise NotImplementedError
+
+    def classify( self, ref, adepth, qual=None ):
+        '''
+            @param ref - Reference name
+            @param adepth - Array of align depths
+            @param qual - Array of qualities for the same bases as adepth
+            @return boolean numpy array that is True where the base is low coverage
+
+            >>> ThresholdPolicy( 10 ).classify( 'ref', [9, 10, 11] ).tolist()
+            [True, False, False]
+        '''
+        adepth = np.asarray( adepth )
+        return adepth < self.threshold( ref, adepth )
+
+class ThresholdPolicy( CoveragePolicy ):
+    """ Fixed align depth threshold that can be different for each reference """
+    def __init__( self, threshold=None, per_reference=None ):
+        '''
+            @param threshold - Align depth threshold. Defaults to LowCoverageCalc.lowReadThreshold
+            @param per_reference - dictionary of reference name: threshold that overrides threshold
+        '''
+        self._threshold = threshold
+        self.per_reference = dict( per_reference or {} )
+
+    def threshold( self, ref, adepth ):
+        if ref in self.per_reference:
+            return self.per_reference[ref]
+        if self._threshold is None:
+            return LowCoverageCalc.lowReadThreshold
+        return self._threshold
+
+class MedianPolicy( CoveragePolicy ):
+    """
+        Threshold that is a fraction of the median align depth of the reference's
+        covered(depth > 0) bases so deep and shallow references are judged on their own
+    """
+    needs_reference = True
+
+    def __init__( self, fraction=0.1, minimum=1 ):
+        '''
+            @param fraction - Fraction of the median depth that is the threshold
+            @param minimum - Lowest threshold to use
+        '''
+        self.fraction = fraction
+        self.minimum = minimum
+
+    def threshold( self, ref, adepth ):
+        '''
+            >>> MedianPolicy( 0.5 ).threshold( 'ref', np.array( [0, 10, 20, 30] ) )
+            10.0
+        '''
+        covered = adepth[adepth > 0]
+        if not len( covered ):
+            return self.minimum
+        return max( self.fraction * np.median( covered ), self.minimum )
+
+class QualityPolicy( CoveragePolicy ):
+    """ Another policy where bases below a quality are also low coverage """
+    def __init__( self, policy=None, minqual=20 ):
+        '''
+            @param policy - CoveragePolicy for the depth. Defaults to DEFAULT_POLICY
+            @param minqual - Quality that is low coverage when below it
+        '''
+        self.policy = policy or DEFAULT_POLICY
+        self.minqual = minqual
+
+    @property
+    def needs_reference( self ):
+        return self.policy.needs_reference
+
+    def threshold( self, ref, adepth ):
+        return self.policy.threshold( ref, adepth )
+
+    def classify( self, ref, adepth, qual=None ):
+        lowmask = self.policy.classify( ref, adepth, qual )
+        if qual is None:
+            return lowmask
+        return lowmask | (np.asarray( qual ) < self.minqual)
+
+# Same classification as LowCoverageCalc.isLowCoverage
+DEFAULT_POLICY = ThresholdPolicy()
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod()
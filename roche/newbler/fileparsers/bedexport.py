@@ -0,0 +1,170 @@
+###
+## Write coverage regions as BED and align depth as bedGraph
+###
+
+import numpy as np
+
+from alignmentinfo import iter_alignments, sweep_regions
+
+def bed_lines( ref, regions, rtypes=None ):
+    '''
+        BED lines(0 based start, end not included) for CoverageRegions with the
+        region type as the name
+
+        @param ref - Reference name
+        @param regions - List of CoverageRegion
+        @param rtypes - Only regions with these rtypes. Defaults to all
+        @return list of lines without line endings
+    '''
+    return ['{}\t{}\t{}\t{}'.format( ref, r.start - 1, r.end, r.rtype )
+        for r in regions if rtypes is None or r.rtype in rtypes]
+
+def write_bed( fh, refregions, rtypes=None ):
+    '''
+        Write merged regions such as AlignmentInfo.merge_regions() returns
+
+        @param fh - File handle to write to
+        @param refregions - dictionary of reference name: [CoverageRegion] or
+            list of (reference name, [CoverageRegion])
+        @param rtypes - Only regions with these rtypes. Defaults to all
+        @return number of lines written
+    '''
+    if isinstance( refregions, dict ):
+        refregions = sorted( refregions.items() )
+    count = 0
+    for ref, regions in refregions:
+        lines = bed_lines( ref, regions, rtypes )
+        if lines:
+            fh.write( '\n'.join( lines ) + '\n' )
+        count += len( lines )
+    return count
+
+def stream_bed( filepath, fh, rtypes=None ):
+    '''
+        Write the merged regions of a 454AlignmentInfo.tsv while it is parsed.
+        Only the regions of the current reference are kept and they are written as
+        soon as the next reference starts
+
+        @param filepath - Path to 454AlignmentInfo.tsv
+        (see write_bed for the rest)
+    '''
+    count = 0
+    ref = None
+    regions = []
+    for seqalign in iter_alignments( filepath, columnar=True ):
+        if seqalign.name != ref:
+            if ref is not None:
+                count += write_bed( fh, [(ref, sweep_regions( regions ))], rtypes )
+            ref = seqalign.name
+            regions = []
+        regions += seqalign.regions
+    if ref is not None:
+        count += write_bed( fh, [(ref, sweep_regions( regions ))], rtypes )
+    return count
+
+class BedGraphWriter( object ):
+    '''
+        Writes bedGraph lines of align depth from the contigs of one or more
+        references in position order. Positions between contigs have 0 depth.
+        With collapse adjacent positions that have the same depth are a single line
+        and the last line is held back until it is known where it ends
+    '''
+    def __init__( self, fh, collapse=True ):
+        '''
+            @param fh - File handle to write to
+            @param collapse - Write runs of the same depth as one line instead of
+                a line per position
+        '''
+        self.fh = fh
+        self.collapse = collapse
+        self.count = 0
+        self._ref = None
+        # Last position written for _ref
+        self._last = 0
+        # (start, end, value) run that is not written yet(1 based inclusive)
+        self._pending = None
+
+    def _write( self, ref, starts, ends, values ):
+        if not len( starts ):
+            return
+        self.fh.write( '\n'.join( '{}\t{}\t{}\t{}'.format( ref, s - 1, e, v )
+            for s, e, v in zip( starts.tolist(), ends.tolist(), values.tolist() ) ) + '\n' )
+        self.count += len( starts )
+
+    def flush( self ):
+        ''' Write the held back line '''
+        if self._pending is not None:
+            start, end, value = self._pending
+            self._write( self._ref, np.array( [start] ), np.array( [end] ), np.array( [value] ) )
+            self._pending = None
+
+    def add( self, ref, pos, depth ):
+        '''
+            @param ref - Reference name
+            @param pos - Position array of a contig in ascending order. Indels use the first
+                position and positions that were already written for ref are skipped
+            @param depth - Depth array for pos
+        '''
+        if ref != self._ref:
+            self.flush()
+            self._ref = ref
+            self._last = 0
+        positions, first = np.unique( pos, return_index=True )
+        depth = np.asarray( depth )[first]
+        keep = positions > self._last
+        positions, depth = positions[keep], depth[keep]
+        if not len( positions ):
+            return
+        # Dense depth from right after the last position written up to the end of this contig
+        start = self._last + 1
+        dense = np.zeros( int( positions[-1] ) - start + 1, dtype=np.int64 )
+        dense[positions - start] = depth
+        if self.collapse:
+            runs = np.concatenate( ([0], np.flatnonzero( np.diff( dense ) ) + 1) )
+            starts = runs + start
+            ends = np.concatenate( (runs[1:], [len( dense )]) ) + start - 1
+            values = dense[runs]
+            # Continue the held back run if it has the same depth
+            if self._pending is not None:
+                pstart, pend, pvalue = self._pending
+                if pvalue == values[0]:
+                    starts[0] = pstart
+                else:
+                    self.flush()
+            self._pending = None
+            self._write( ref, starts[:-1], ends[:-1], values[:-1] )
+            self._pending = (int( starts[-1] ), int( ends[-1] ), int( values[-1] ))
+        else:
+            starts = np.arange( start, start + len( dense ) )
+            self._write( ref, starts, starts, dense )
+        self._last = int( positions[-1] )
+
+def write_bedgraph( fh, ai, collapse=True ):
+    '''
+        Write the align depth of every reference of an AlignmentInfo
+
+        @param fh - File handle to write to
+        @param ai - AlignmentInfo
+        @param collapse - Write runs of the same depth as one line
+        @return number of lines written
+    '''
+    writer = BedGraphWriter( fh, collapse )
+    for ref in ai.references():
+        track = ai.track( ref )
+        writer.add( ref, np.flatnonzero( track.covered ) + 1, track.adepth[track.covered] )
+    writer.flush()
+    return writer.count
+
+def stream_bedgraph( filepath, fh, collapse=True ):
+    '''
+        Write the align depth of a 454AlignmentInfo.tsv as bedGraph while it is
+        parsed so only a single contig is in memory at a time
+
+        @param filepath - Path to 454AlignmentInfo.tsv
+        (see write_bedgraph for the rest)
+    '''
+    writer = BedGraphWriter( fh, collapse )
+    for seqalign in iter_alignments( filepath, columnar=True ):
+        writer.add( seqalign.name, seqalign.pos, seqalign.adepth )
+    writer.flush()
+    return writer.count
@@ -0,0 +1,352 @@
+###
+## Per reference coverage arrays built from the SeqAlignments in 454AlignmentInfo.tsv
+###
+
+import numpy as np
+
+# Columns that are copied into a ReferenceTrack
+TRACK_COLUMNS = ('refb','consb','qual','udepth','adepth','tdepth','signal','stddev')
+
+class ReferenceTrack( object ):
+    '''
+        Dense arrays for a single reference where index i holds position i+1.
+        Built from all of the SeqAlignments of that reference. Positions that
+        have indels use the first base line, positions that more than one
+        SeqAlignment covers use the first SeqAlignment and positions that no SeqAlignment
+        covers have 0 depth and are False in covered.
+    '''
+    def __init__( self, name, seqaligns ):
+        '''
+            @param name - Reference name
+            @param seqaligns - List of SeqAlignment/ColumnarSeqAlignment for the reference
+        '''
+        self.name = name
+        length = max( [sa.lastPos for sa in seqaligns] + [0] )
+        self.covered = np.zeros( length, dtype=bool )
+        for column in TRACK_COLUMNS:
+            setattr( self, column, None )
+        for sa in seqaligns:
+            pos = sa.column( 'pos' )
+            if not len( pos ):
+                continue
+            # First base line of every position that an earlier contig did not cover
+            positions, first = np.unique( pos, return_index=True )
+            index = positions - 1
+            new = ~self.covered[index]
+            index, first = index[new], first[new]
+            for column in TRACK_COLUMNS:
+                values = sa.column( column )
+                if values is None:
+                    continue
+                if getattr( self, column ) is None:
+                    setattr( self, column, self._empty( values.dtype, length ) )
+                getattr( self, column )[index] = values[first]
+            self.covered[index] = True
+        if self.adepth is None:
+            self.adepth = np.zeros( length, dtype=np.int32 )
+            self.qual = np.zeros( length, dtype=np.int16 )
+
+    @staticmethod
+    def _empty( dtype, length ):
+        ''' Uncovered value for a column '''
+        if dtype.kind == 'S':
+            return np.array( ['-'] * length, dtype=dtype )
+        return np.zeros( length, dtype=dtype )
+
+    def __len__( self ):
+        return len( self.covered )
+
+# Number of positions that share a min/max entry in RangeStats
+BLOCK_SIZE = 128
+
+class RangeStats( object ):
+    '''
+        Answers depth and quality questions about any window of a ReferenceTrack
+        in constant time using cumulative sums that are built once per reference.
+        Min and max depth use the min and max of every BLOCK_SIZE positions with a
+        sparse table over those blocks so they only take O(n) memory. They are built
+        the first time they are asked for
+    '''
+    def __init__( self, track, lowmask ):
+        '''
+            @param track - ReferenceTrack
+            @param lowmask - Boolean array that is True for the low coverage positions of
+                track(such as from CoveragePolicy.classify)
+        '''
+        self.length = len( track )
+        covered = track.covered
+        self._values = track.adepth.astype( np.int32 )
+        self._depth = self._cumsum( self._values, np.int64 )
+        self._low = self._cumsum( lowmask, np.int32 )
+        self._qual = self._cumsum( np.where( covered, track.qual, 0 ), np.int64 )
+        self._covered = self._cumsum( covered, np.int32 )
+        self._min = None
+        self._max = None
+
+    @staticmethod
+    def _cumsum( values, dtype ):
+        ''' Cumulative sum with a leading 0 so sum(values[i:j]) == c[j] - c[i] '''
+        return np.concatenate( (np.zeros( 1, dtype=dtype ), np.cumsum( values, dtype=dtype )) )
+
+    @staticmethod
+    def _sparse_table( values, func ):
+        ''' Level k holds func over every window of 2**k values '''
+        table = [values]
+        width = 1
+        while width * 2 <= len( values ):
+            prev = table[-1]
+            table.append( func( prev[:-width], prev[width:] ) )
+            width *= 2
+        return table
+
+    def _build_extremes( self ):
+        ''' Sparse tables over the min and max of every block '''
+        starts = np.arange( 0, self.length, BLOCK_SIZE )
+        self._min = self._sparse_table( np.minimum.reduceat( self._values, starts ), np.minimum )
+        self._max = self._sparse_table( np.maximum.reduceat( self._values, starts ), np.maximum )
+
+    @staticmethod
+    def _query_table( table, func, left, right ):
+        ''' func over values[left:right+1] '''
+        level = int( right - left + 1 ).bit_length() - 1
+        return func( table[level][left], table[level][right - (1 << level) + 1] )
+
+    def _extreme( self, table, func, left, right ):
+        ''' func(np.minimum or np.maximum) over depth[left:right+1] '''
+        lblock = left // BLOCK_SIZE
+        rblock = right // BLOCK_SIZE
+        if lblock == rblock:
+            return func.reduce( self._values[left:right+1] )
+        # Partial blocks at either end are scanned
+        value = func( func.reduce( self._values[left:(lblock + 1) * BLOCK_SIZE] ),
+            func.reduce( self._values[rblock * BLOCK_SIZE:right+1] ) )
+        if lblock + 1 < rblock:
+            value = func( value, self._query_table( table, func, lblock + 1, rblock - 1 ) )
+        return value
+
+    def query( self, start, end, extremes=True ):
+        '''
+            @param start - First position of the window(1 based, inclusive)
+            @param end - Last position of the window(inclusive)
+            @param extremes - Also give min_depth and max_depth
+            @return dictionary with mean_depth, min_depth, max_depth, frac_low(fraction of
+                positions in lowmask) and mean_qual(mean quality of covered
+                positions or 0.0 if none are covered)
+        '''
+        if start < 1 or end < start:
+            raise ValueError( "Invalid region {}-{}".format( start, end ) )
+        size = end - start + 1
+        # Positions past the end of the track are not covered
+        tend = min( end, self.length )
+        beyond = end - max( tend, start - 1 )
+        left, right = start - 1, tend
+        if left < right:
+            depth = self._depth[right] - self._depth[left]
+            low = self._low[right] - self._low[left]
+            qual = self._qual[right] - self._qual[left]
+            covered = self._covered[right] - self._covered[left]
+        else:
+            depth = low = qual = covered = 0
+        stats = {
+            'mean_depth': float( depth ) / size,
+            'frac_low': float( low + beyond ) / size,
+            'mean_qual': float( qual ) / covered if covered else 0.0,
+        }
+        if extremes:
+            if left < right:
+                if self._min is None:
+                    self._build_extremes()
+                mindepth = int( self._extreme( self._min, np.minimum, left, right - 1 ) )
+                maxdepth = int( self._extreme( self._max, np.maximum, left, right - 1 ) )
+            else:
+                mindepth = maxdepth = 0
+            if beyond:
+                mindepth = 0
+            stats['min_depth'] = mindepth
+            stats['max_depth'] = maxdepth
+        return stats
+
+def _bin_widths( length, bin_size ):
+    ''' 0 based start and number of positions of every bin of a reference '''
+    starts = np.arange( 0, length, bin_size, dtype=np.int64 )
+    return starts, np.minimum( bin_size, length - starts )
+
+def _bins( starts, widths, total, low, high ):
+    ''' Dictionary of bin arrays that binned_depth and DepthBinner return '''
+    return {
+        'start': starts + 1,
+        'end': starts + widths,
+        'mean': total / widths.astype( np.float64 ),
+        'min': low,
+        'max': high,
+    }
+
+def binned_depth( depth, bin_size ):
+    '''
+        Downsample a per position depth array into fixed size bins
+
+        @param depth - Depth array where index i is position i+1
+        @param bin_size - Number of positions in each bin(the last bin can be shorter)
+        @return dictionary of arrays with an entry for every bin. start and end are the
+            1 based positions(inclusive) of the bin and mean, min and max its depth
+
+        >>> bins = binned_depth( np.array( [1, 2, 3, 4, 5] ), 2 )
+        >>> bins['mean'].tolist(), bins['min'].tolist(), bins['end'].tolist()
+        ([1.5, 3.5, 5.0], [1, 3, 5], [2, 4, 5])
+    '''
+    if bin_size < 1:
+        raise ValueError( "bin_size has to be at least 1" )
+    depth = np.asarray( depth, dtype=np.int64 )
+    starts, widths = _bin_widths( len( depth ), bin_size )
+    if not len( depth ):
+        empty = np.zeros( 0, dtype=np.int64 )
+        return _bins( starts, widths, empty, empty, empty )
+    return _bins( starts, widths,
+        np.add.reduceat( depth, starts ),
+        np.minimum.reduceat( depth, starts ),
+        np.maximum.reduceat( depth, starts ) )
+
+class DepthBinner( object ):
+    '''
+        Builds the same bins as binned_depth from one contig at a time while only
+        keeping the per bin totals in memory. Positions that are added more than
+        once(indels) use the first one
+    '''
+    def __init__( self, bin_size ):
+        '''
+            @param bin_size - Number of positions in each bin
+        '''
+        if bin_size < 1:
+            raise ValueError( "bin_size has to be at least 1" )
+        self.bin_size = bin_size
+        # Last position that was added
+        self.length = 0
+        self._total = np.zeros( 0, dtype=np.int64 )
+        self._min = np.zeros( 0, dtype=np.int64 )
+        self._max = np.zeros( 0, dtype=np.int64 )
+        # Number of positions in each bin that were added
+        self._count = np.zeros( 0, dtype=np.int64 )
+
+    def _grow( self, nbins ):
+        ''' Make room for nbins bins '''
+        extra = nbins - len( self._total )
+        if extra <= 0:
+            return
+        self._total = np.concatenate( (self._total, np.zeros( extra, dtype=np.int64 )) )
+        self._min = np.concatenate( (self._min, np.full( extra, np.iinfo( np.int64 ).max, dtype=np.int64 )) )
+        self._max = np.concatenate( (self._max, np.zeros( extra, dtype=np.int64 )) )
+        self._count = np.concatenate( (self._count, np.zeros( extra, dtype=np.int64 )) )
+
+    def add( self, pos, depth ):
+        '''
+            @param pos - Position array of a contig in ascending order
+            @param depth - Depth array for pos
+        '''
+        if not len( pos ):
+            return
+        positions, first = np.unique( pos, return_index=True )
+        depth = np.asarray( depth, dtype=np.int64 )[first]
+        bins = (positions.astype( np.int64 ) - 1) // self.bin_size
+        self._grow( bins[-1] + 1 )
+        # Positions are sorted so each bin is a single run
+        runs = np.concatenate( ([0], np.flatnonzero( np.diff( bins ) ) + 1) )
+        used = bins[runs]
+        self._total[used] += np.add.reduceat( depth, runs )
+        self._min[used] = np.minimum( self._min[used], np.minimum.reduceat( depth, runs ) )
+        self._max[used] = np.maximum( self._max[used], np.maximum.reduceat( depth, runs ) )
+        self._count[used] += np.diff( np.concatenate( (runs, [len( depth )]) ) )
+        self.length = max( self.length, int( positions[-1] ) )
+
+    def bins( self ):
+        ''' Bins of everything added so far(see binned_depth) '''
+        starts, widths = _bin_widths( self.length, self.bin_size )
+        nbins = len( starts )
+        self._grow( nbins )
+        count = self._count[:nbins]
+        # Positions that were never added have 0 depth
+        low = np.where( count < widths, 0, self._min[:nbins] )
+        return _bins( starts, widths, self._total[:nbins].copy(), low, self._max[:nbins].copy() )
+
+def _padded( values, length, fill ):
+    ''' values extended to length with fill '''
+    padded = np.empty( length, dtype=values.dtype )
+    padded[:len( values )] = values
+    padded[len( values ):] = fill
+    return padded
+
+def track_diff( track, other, min_depth_change=1 ):
+    '''
+        Positions where the align depth or consensus base of two ReferenceTracks
+        of the same reference differ. The shorter track counts as not covered
+        past its end
+
+        @param track - ReferenceTrack
+        @param other - ReferenceTrack to compare against
+        @param min_depth_change - Depth has to change by at least this much to count
+        @return None if nothing changed or dictionary of
+            positions - 1 based positions that changed
+            depth_delta - other depth - track depth at those positions
+            consb/other_consb - consensus bases at those positions(- where not covered)
+            regions - list of (start, end) runs of adjacent changed positions(inclusive)
+    '''
+    length = max( len( track ), len( other ) )
+    columns = []
+    for t in (track, other):
+        consb = t.consb
+        if consb is None:
+            consb = np.array( ['-'] * len( t ), dtype='S1' )
+        columns.append( (
+            _padded( t.adepth.astype( np.int64 ), length, 0 ),
+            _padded( consb.astype( 'S1' ), length, '-' ),
+            _padded( t.covered, length, False ),
+        ) )
+    (depth, consb, covered), (odepth, oconsb, ocovered) = columns
+    delta = odepth - depth
+    changed = (np.abs( delta ) >= min_depth_change) | (consb != oconsb) | (covered != ocovered)
+    index = np.flatnonzero( changed )
+    if not len( index ):
+        return None
+    positions = index + 1
+    return {
+        'positions': positions,
+        'depth_delta': delta[index],
+        'consb': consb[index],
+        'other_consb': oconsb[index],
+        'regions': position_runs( positions ),
+    }
+
+def position_runs( positions ):
+    '''
+        @param positions - Sorted array of unique positions
+        @return list of (start, end) runs of adjacent positions(inclusive)
+    '''
+    positions = np.asarray( positions )
+    if not len( positions ):
+        return []
+    breaks = np.flatnonzero( np.diff( positions ) > 1 )
+    starts = np.concatenate( ([positions[0]], positions[breaks + 1]) )
+    ends = np.concatenate( (positions[breaks], [positions[-1]]) )
+    return zip( starts.tolist(), ends.tolist() )
+
+def homopolymer_flags( pos, signal, stddev, max_deviation=0.3, max_stddev=0.3 ):
+    '''
+        Positions where the flow signal is not close to a whole homopolymer length
+        or varies a lot between reads which is where 454 homopolymer errors are
+
+        @param pos - Position array of the base lines
+        @param signal - Signal array of the base lines
+        @param stddev - Signal standard deviation array of the base lines
+        @param max_deviation - Flag when the signal is further than this from the nearest
+            whole number
+        @param max_stddev - Flag when stddev is above this
+        @return list of (start, end) runs of flagged positions(inclusive)
+
+        >>> homopolymer_flags( [1, 2, 3, 4, 6], [1.0, 2.5, 1.1, 0.9, 3.6], [0.1, 0.1, 0.1, 0.4, 0.1] )
+        [(2, 2), (4, 4), (6, 6)]
+    '''
+    signal = np.asarray( signal, dtype=np.float64 )
+    stddev = np.asarray( stddev, dtype=np.float64 )
+    # Small tolerance because the columns may be float32
+    deviation = np.abs( signal - np.round( signal ) )
+    flagged = (deviation > max_deviation + 1e-6) | (stddev > max_stddev + 1e-6)
+    return position_runs( np.unique( np.asarray( pos )[flagged] ) )
@@ -1,3 +1,6 @@
+# Bases that are allowed in a nucleotide column
+VALID_BASES = ('A','G','T','C','N','-')
+
 class DescriptorBase( object ):
     def __init__( self, name ):
         '''
@@ -11,6 +14,18 @@ class DescriptorBase( object ):
     def __set__( self, inst, value ):
         setattr( inst, self.store_name, value )
 
+class LazyLines( DescriptorBase ):
+    '''
+        Lines that can be set as a list or as a FileBlock that is read the first
+        time the lines are accessed
+    '''
+    def __get__( self, inst, klass ):
+        value = getattr( inst, self.store_name )
+        if hasattr( value, 'read' ):
+            value = value.read()
+            setattr( inst, self.store_name, value )
+        return value
+
 class ValidSetDescriptor( DescriptorBase ):
     ''' Allow only values from a defined set and/or types '''
     def __init__( self, name, valid_values='ANY', valid_types='ANY' ):
@@ -37,8 +52,7 @@ class Nucleotide( ValidSetDescriptor ):
         Probably should use Biopython to check this but I'm lazy
     '''
     def __init__( self, name ):
-        valid_bases = ('A','G','T','C','N','-')
-        super( Nucleotide, self ).__init__( name, valid_bases )
+        super( Nucleotide, self ).__init__( name, VALID_BASES )
 
 class GreaterThanZero( NumberDescriptor ):
     ''' Number greater than zero '''
@@ -1,12 +1,154 @@
+import numpy as np
+
 from variantfileparser import VarFile, Variant
 from descriptors import *
+from tokenizer import field_table, convert_column
+from readblocks import AccessionTable, parse_read_block
+
+# Column name and numpy dtype of the summary line fields in Diffs.to_table
+# Any other fields are kept as strings
+TABLE_DTYPES = {
+    'start_pos': np.int64,
+    'end_pos': np.int64,
+    'total_depth': np.int64,
+    'var_freq': np.float64,
+    'fwd_w_var': np.int64,
+    'rev_w_var': np.int64,
+    'fwd_total': np.int64,
+    'rev_total': np.int64,
+}
+
+class DiffFilter( object ):
+    '''
+        Conditions a variant has to meet to be kept by Diffs. They are checked on the
+        raw summary line columns so variants that fail are never built
+    '''
+    def __init__( self, min_freq=None, min_depth=None, references=None, window=None ):
+        '''
+            @param min_freq - Minimum Var Freq as a percent(5 or '5%')
+            @param min_depth - Minimum Total Depth
+            @param references - Reference accessions to keep(with or without the >)
+            @param window - (start, end) positions the variant has to overlap
+        '''
+        self.min_freq = min_freq
+        if isinstance( min_freq, basestring ):
+            self.min_freq = float( min_freq.replace( '%', '' ) )
+        self.min_depth = min_depth
+        self.references = references
+        if references is not None:
+            self.references = set( ref.lstrip( '>' ) for ref in references )
+        self.window = window
+
+    def matcher( self, headers ):
+        '''
+            @param headers - Headers of the Diffs file
+            @return function that takes the list of columns of a summary line and
+                returns True if the variant is kept
+        '''
+        ref = headers.index( '>Reference >Accno' )
+        start = headers.index( 'Start Pos' )
+        end = headers.index( 'End Pos' )
+        depth = headers.index( 'Total Depth' )
+        freq = headers.index( 'Var Freq' )
+        ncols = len( headers )
+        def match( cols ):
+            if len( cols ) != ncols:
+                # Let parse_summary_line complain about it
+                return True
+            if self.min_depth is not None and int( cols[depth] ) < self.min_depth:
+                return False
+            if self.min_freq is not None and float( cols[freq].replace( '%', '' ) ) < self.min_freq:
+                return False
+            if self.references is not None and cols[ref].lstrip( '>' ) not in self.references:
+                return False
+            if self.window is not None:
+                wstart, wend = self.window
+                if int( cols[end] ) < wstart or int( cols[start] ) > wend:
+                    return False
+            return True
+        return match
 
 class Diffs( VarFile ):
     ''' 454AllDiffs.txt and 454HCDiffs.txt '''
+    def __init__( self, fh_or_filepath, where=None, build=True ):
+        '''
+            @param fh_or_filepath - File path or file handle
+            @param where - DiffFilter to only keep some of the variants
+            @param build - Build the DiffVariants. Without them only to_table is useful
+        '''
+        self.where = where
+        self.build = build
+        # Read accessions shared by the read blocks of all variants
+        self.accessions = AccessionTable()
+        super( Diffs, self ).__init__( fh_or_filepath )
+
+    @classmethod
+    def read_table( cls, fh_or_filepath, where=None ):
+        '''
+            Columnar table of a Diffs file without building any DiffVariant
+
+            @param fh_or_filepath - File path or file handle
+            @param where - DiffFilter to only keep some of the variants
+            @return same as to_table
+        '''
+        return cls( fh_or_filepath, where, build=False ).to_table()
+
+    def summary_blocks( self ):
+        ''' (summary line, FileBlock) of the variants that pass where '''
+        match = None
+        if self.where is not None:
+            match = self.where.matcher( self.headers )
+        for summary, block in self.read_variant_blocks():
+            if match is not None and not match( summary.split( '\t' ) ):
+                continue
+            yield summary, block
+
+    def to_table( self ):
+        '''
+            All summary line fields as a dictionary of column name: numpy array where
+            the column names are the DiffVariant attribute names(reference_accno,
+            start_pos, var_freq, fwd_w_var...). Positions, depths and counts are ints,
+            var_freq is a float percent and the rest are strings
+
+            @return dictionary of column name: array with a value per variant in file order
+        '''
+        names = [self.column_name( hdr ) for hdr in self.headers]
+        rows = []
+        for summary, block in self.summary_blocks():
+            cols = summary.split( '\t' )
+            if len( cols ) != len( names ):
+                # Same error parse_summary_line gives
+                self.parse_summary_line( summary )
+            rows.append( cols )
+        if not rows:
+            return dict( (name, np.array( [], dtype=TABLE_DTYPES.get( name, str ) )) for name in names )
+        table = field_table( rows )
+        columns = {}
+        for i, name in enumerate( names ):
+            if name == 'var_freq':
+                columns[name] = np.char.replace( table[:,i], '%', '' ).astype( np.float64 )
+            elif name in TABLE_DTYPES:
+                columns[name] = convert_column( table, i, TABLE_DTYPES[name] )
+            else:
+                columns[name] = table[:,i].copy()
+        return columns
+
+    def column_name( self, header ):
+        ''' DiffVariant attribute name of a header '''
+        if header == '>Reference >Accno':
+            return 'reference_accno'
+        return header.replace( ' ', '_' ).lower()
+
+    def variant_interval( self, variant ):
+        return (variant.start_pos, variant.end_pos)
+
     def parse_variants( self ):
-        for varlines in self.read_until_next_variant():
-            sl = self.parse_summary_line( varlines[0] )
-            sl['lines'] = varlines[1:]
+        if not self.build:
+            return
+        for summary, block in self.summary_blocks():
+            sl = self.parse_summary_line( summary )
+            sl['lines'] = block
+            sl['accessions'] = self.accessions
             key = sl['>Reference >Accno']
             # Remove the stupid > chars 
             sl['Reference Accno'] = key
@@ -33,10 +175,13 @@ class DiffVariant( Variant ):
     rev_total = GreaterThanEqualZeroInt( 'rev_total' )
 
     tgt_region_status = ValidSetDescriptor( 'tgt_region_status', valid_values=('InRegion','InExtRegion') )
+    lines = LazyLines( 'lines' )
+    _read_blocks = None
     
     def __init__( self, *args, **kwargs ):
         self.lines = kwargs['lines']
         del kwargs['lines']
+        self.accessions = kwargs.pop( 'accessions', None )
         kwargs = self.mapkeys( kwargs )
         always = (
             'reference_accno',
@@ -75,3 +220,28 @@ class DiffVariant( Variant ):
                 'tgt_region_status',
             )
             self.set_attributes( reg_options, kwargs )
+
+    def read_blocks( self ):
+        ''' (reads, other_reads) parsed from lines the first time it is needed '''
+        if self._read_blocks is None:
+            if self.accessions is None:
+                self.accessions = AccessionTable()
+            self._read_blocks = parse_read_block( self.lines, self.accessions )
+        return self._read_blocks
+
+    @property
+    def reads( self ):
+        ''' ReadAlignments of the Reads with Difference '''
+        return self.read_blocks()[0]
+
+    @property
+    def other_reads( self ):
+        ''' ReadAlignments of the Other Reads '''
+        return self.read_blocks()[1]
+
+    def strand_counts( self, weighted=False ):
+        '''
+            (forward, reverse) counts of the reads with the difference
+            (see ReadAlignments.strand_counts)
+        '''
+        return self.reads.strand_counts( weighted )
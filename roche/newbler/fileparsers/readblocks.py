@@ -0,0 +1,140 @@
+###
+## Per read alignments of the Reads with Difference and Other Reads sections of 454*Diffs.txt
+###
+
+import numpy as np
+
+READS_HEADER = 'Reads with Difference:'
+OTHER_HEADER = 'Other Reads:'
+SIGNAL_HEADER = 'Signal Distribution:'
+
+class AccessionTable( object ):
+    '''
+        Gives every read accession an integer id so the same read in many variants
+        is only stored once
+    '''
+    def __init__( self ):
+        self.names = []
+        self.ids = {}
+
+    def intern( self, name ):
+        ''' id of name that is added if it is not known yet '''
+        try:
+            return self.ids[name]
+        except KeyError:
+            self.ids[name] = len( self.names )
+            self.names.append( name )
+            return self.ids[name]
+
+    def __getitem__( self, id ):
+        return self.names[id]
+
+    def __len__( self ):
+        return len( self.names )
+
+class ReadAlignments( object ):
+    '''
+        Reads of a single section as arrays with an entry per read line
+        accession - ids in the AccessionTable
+        reverse - True for reads aligned to the - strand
+        start, end - Read positions at the start and end of the aligned segment
+        dups - Duplicate count that is in () after the accession(1 when missing)
+    '''
+    def __init__( self, table, accession, reverse, start, end, dups ):
+        self.table = table
+        self.accession = np.array( accession, dtype=np.int32 )
+        self.reverse = np.array( reverse, dtype=bool )
+        self.start = np.array( start, dtype=np.int64 )
+        self.end = np.array( end, dtype=np.int64 )
+        self.dups = np.array( dups, dtype=np.int32 )
+
+    def __len__( self ):
+        return len( self.accession )
+
+    @property
+    def accessions( self ):
+        ''' List of the read accessions '''
+        return [self.table[id] for id in self.accession]
+
+    def strand_counts( self, weighted=False ):
+        '''
+            @param weighted - Count every read line dups times instead of once
+            @return (forward, reverse) read counts
+        '''
+        if weighted:
+            reverse = int( self.dups[self.reverse].sum() )
+            return int( self.dups.sum() ) - reverse, reverse
+        reverse = int( self.reverse.sum() )
+        return len( self ) - reverse, reverse
+
+def parse_read_line( line, table ):
+    '''
+        Split a read line such as
+        H52E4QC02G8I0I  (2)         848- ATGGAT-CCAAACACTGTGTCAAGCTT 823
+
+        @param line - Read line
+        @param table - AccessionTable to intern the accession into
+        @return (accession id, reverse, start, end, dups)
+        @raises ValueError if the line is not a read line
+    '''
+    fields = line.split()
+    if len( fields ) == 5 and fields[1].startswith( '(' ):
+        dups = int( fields[1][1:-1] )
+        del fields[1]
+    elif len( fields ) == 4:
+        dups = 1
+    else:
+        raise ValueError( "{} is not a read alignment line".format( line ) )
+    accession, start, segment, end = fields
+    strand = start[-1]
+    if strand not in '+-':
+        raise ValueError( "{} does not have a strand on its start position".format( line ) )
+    return table.intern( accession ), strand == '-', int( start[:-1] ), int( end ), dups
+
+def parse_read_block( lines, table=None ):
+    '''
+        Parse the lines of a DiffVariant into the reads with the difference and the
+        other reads. The reference, * marker and Signal Distribution lines are skipped
+
+        @param lines - Lines of the variant(without the summary line)
+        @param table - AccessionTable to use. A new one is made if not given
+        @return (reads with difference, other reads) as ReadAlignments
+    '''
+    if table is None:
+        table = AccessionTable()
+    sections = {READS_HEADER: [], OTHER_HEADER: []}
+    section = None
+    for line in lines:
+        if line in sections:
+            section = sections[line]
+        elif line == SIGNAL_HEADER:
+            section = None
+        elif section is None or line.startswith( 'reference ' ) or not line.strip( ' *' ):
+            continue
+        else:
+            section.append( parse_read_line( line, table ) )
+    blocks = []
+    for header in (READS_HEADER, OTHER_HEADER):
+        # zip(*[]) gives nothing so empty sections need their own empty columns
+        columns = zip( *sections[header] ) or [[]] * 5
+        blocks.append( ReadAlignments( table, *columns ) )
+    return tuple( blocks )
+
+def read_support_table( variants, weighted=False ):
+    '''
+        Strand counts of many variants as arrays with an entry per variant
+
+        @param variants - List of DiffVariant
+        @param weighted - See ReadAlignments.strand_counts
+        @return dictionary of var_forward, var_reverse, other_forward, other_reverse: int array
+    '''
+    counts = np.zeros( (len( variants ), 4), dtype=np.int64 )
+    for i, variant in enumerate( variants ):
+        counts[i,:2] = variant.reads.strand_counts( weighted )
+        counts[i,2:] = variant.other_reads.strand_counts( weighted )
+    return {
+        'var_forward': counts[:,0],
+        'var_reverse': counts[:,1],
+        'other_forward': counts[:,2],
+        'other_reverse': counts[:,3],
+    }
@@ -5,15 +5,16 @@
 import re
 import sys
 
+from tokenizer import MappedFile, split_fields
+
 class RefStatus:
     def __init__( self, file_path ):
         self.__file_path = file_path
         self.__read()
 
     def __read( self ):
-        fh = open( self.__file_path )
-        self.__file_contents = [line.strip() for line in fh.readlines()]
-        fh.close()
+        with MappedFile( self.__file_path ) as mf:
+            self.__file_contents = [line.strip() for line in mf.lines()]
 
     def _parse_headers( self ):
         '''
@@ -42,8 +43,7 @@ class RefStatus:
         '''
         headers = self._parse_headers( )
         self.ref_status = {}
-        for line in self.__file_contents[2:]:
-            s = line.split( '\t' )
+        for s in split_fields( self.__file_contents[2:] ):
             self.ref_status[s[0]] = dict( zip( headers[1:], s[1:] ) )
 
     def get_likely_reference( self ):
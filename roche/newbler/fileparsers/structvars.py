@@ -23,12 +23,15 @@ class StructVars( VarFile ):
         self.headers = self.headers + ['Var ID']
 
     def parse_variants( self ):
-        for varlines in self.read_until_next_variant():
-            sl = self.parse_summary_line( varlines[0] )
-            sl['lines'] = varlines[1:]
+        for summary, block in self.read_variant_blocks():
+            sl = self.parse_summary_line( summary )
+            sl['lines'] = block
             refaccno = sl['Ref Accno1']
             self.add_variant( refaccno, StructVariant( **sl ) )
 
+    def variant_interval( self, variant ):
+        return (variant.refpos1, variant.refpos1)
+
 class StructVariant( object ):
     ''' Represents an instance of a variant in the StructVariants '''
     refaccno1 = ""
@@ -48,6 +51,7 @@ class StructVariant( object ):
     fwdtotal = None
     revtotal = None
     varid = ""
+    lines = LazyLines( 'lines' )
     def __init__( self, *args, **kwargs ):
         '''
             Accepts all arguments that are headers that coorespond to a summary line as well as lines which
@@ -0,0 +1,84 @@
+from nose.tools import eq_, raises
+import os
+import os.path
+import tempfile
+import shutil
+
+import numpy as np
+
+from ..alignmentinfo import AlignmentInfo, LowCoverageCalc, MedianPolicy
+from ..alignmentcache import cache_path, CACHE_SUFFIX
+
+import fixtures
+
+class TestAlignmentCache( object ):
+    def setUp( self ):
+        self.tempdir = tempfile.mkdtemp()
+        self.paths = []
+        for ptype, projs in fixtures.GSPROJECTS.items():
+            for projpath in projs:
+                path = os.path.join( self.tempdir, os.path.basename( projpath ) + '.tsv' )
+                shutil.copy( os.path.join( projpath, ptype, '454AlignmentInfo.tsv' ), path )
+                self.paths.append( path )
+
+    def tearDown( self ):
+        shutil.rmtree( self.tempdir )
+
+    def check_same( self, ai, cai ):
+        eq_( [(sa.name, sa.astart, sa.lastPos, sa.regions) for sa in ai.seqs],
+            [(sa.name, sa.astart, sa.lastPos, sa.regions) for sa in cai.seqs] )
+        eq_( [str(b) for b in ai.seqs[-1].bases], [str(b) for b in cai.seqs[-1].bases] )
+        eq_( ai.merge_regions(), cai.merge_regions() )
+
+    def test_roundtrip( self ):
+        ''' Second load comes memory mapped from the cache and is the same as parsing '''
+        for path in self.paths:
+            ai = AlignmentInfo( path, columnar=True, cache=True )
+            assert os.path.exists( path + CACHE_SUFFIX )
+            cai = AlignmentInfo( path, columnar=True, cache=True )
+            assert isinstance( cai.seqs[0].adepth, np.memmap )
+            self.check_same( ai, cai )
+
+    def test_cachedir( self ):
+        cachedir = os.path.join( self.tempdir, 'cache' )
+        os.mkdir( cachedir )
+        path = self.paths[0]
+        AlignmentInfo( path, columnar=True, cache=cachedir )
+        assert os.path.exists( cache_path( path, cachedir ) )
+        assert not os.path.exists( path + CACHE_SUFFIX )
+        self.check_same( AlignmentInfo( path ), AlignmentInfo( path, columnar=True, cache=cachedir ) )
+
+    def test_threshold_change( self ):
+        ''' Regions come from the threshold when loading not when the cache was written '''
+        path = self.paths[0]
+        AlignmentInfo( path, columnar=True, cache=True )
+        old = LowCoverageCalc.lowReadThreshold
+        try:
+            LowCoverageCalc.lowReadThreshold = 100
+            cai = AlignmentInfo( path, columnar=True, cache=True )
+            assert isinstance( cai.seqs[0].adepth, np.memmap )
+            self.check_same( AlignmentInfo( path, columnar=True ), cai )
+        finally:
+            LowCoverageCalc.lowReadThreshold = old
+
+    def test_policy( self ):
+        ''' Cache is used with any policy '''
+        path = self.paths[0]
+        AlignmentInfo( path, columnar=True, cache=True, policy=MedianPolicy( 0.5 ) )
+        cai = AlignmentInfo( path, columnar=True, cache=True, policy=MedianPolicy( 0.5 ) )
+        assert isinstance( cai.seqs[0].adepth, np.memmap )
+        self.check_same( AlignmentInfo( path, columnar=True, policy=MedianPolicy( 0.5 ) ), cai )
+
+    def test_stale( self ):
+        ''' Changing the file invalidates the cache '''
+        path = self.paths[0]
+        AlignmentInfo( path, columnar=True, cache=True )
+        with open( path, 'a' ) as fh:
+            fh.write( '>NewRef 1\n1\tA\tA\t64\t1\t1\t1\t1.00\t0.01\n' )
+        cai = AlignmentInfo( path, columnar=True, cache=True )
+        eq_( 'NewRef', cai.seqs[-1].name )
+        assert not isinstance( cai.seqs[0].adepth, np.memmap )
+
+    @raises( ValueError )
+    def test_requires_columnar( self ):
+        AlignmentInfo( self.paths[0], cache=True )
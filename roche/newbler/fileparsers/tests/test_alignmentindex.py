@@ -0,0 +1,52 @@
+from nose.tools import eq_, raises
+import os
+import os.path
+import tempfile
+import shutil
+
+from ..alignmentindex import AlignmentIndex, INDEX_SUFFIX
+from ..alignmentinfo import AlignmentInfo
+
+import fixtures
+
+class TestAlignmentIndex( object ):
+    def setUp( self ):
+        self.tempdir = tempfile.mkdtemp()
+        self.aipath = os.path.join( self.tempdir, '454AlignmentInfo.tsv' )
+        shutil.copy( os.path.join( fixtures.PATH, '05_11_2012_1_TI-MID10_PR_2357_AH3',
+            'mapping', '454AlignmentInfo.tsv' ), self.aipath )
+
+    def tearDown( self ):
+        shutil.rmtree( self.tempdir )
+
+    def test_entries( self ):
+        ''' Every block is indexed in file order with its start '''
+        idx = AlignmentIndex( self.aipath )
+        ai = AlignmentInfo( self.aipath )
+        eq_( [(sa.name, sa.astart) for sa in ai.seqs], [e[:2] for e in idx.entries] )
+        assert os.path.exists( self.aipath + INDEX_SUFFIX )
+
+    def test_reload( self ):
+        ''' Index is reused while the file is unchanged and rebuilt when it changes '''
+        idx = AlignmentIndex( self.aipath )
+        assert AlignmentIndex( self.aipath ).load()
+        with open( self.aipath, 'a' ) as fh:
+            fh.write( '>NewRef 1\n1\tA\tA\t64\t1\t1\t1\t1.00\t0.01\n' )
+        idx2 = AlignmentIndex( self.aipath )
+        eq_( len( idx.entries ) + 1, len( idx2.entries ) )
+        assert 'NewRef' in idx2
+
+    def test_load_reference( self ):
+        ''' Loading a single reference gives the same result as a full parse '''
+        full = AlignmentInfo( self.aipath )
+        for columnar in (False, True):
+            ai = AlignmentInfo( self.aipath, columnar=columnar, lazy=True )
+            for name in ('CY081005_NS_Boston09', 'Human/2_(PB1)/H5N1/2/Thailand/2004'):
+                eq_( [sa.regions for sa in full[name]], [sa.regions for sa in ai.load_reference( name )] )
+                eq_( [sa.astart for sa in full[name]], [sa.astart for sa in ai[name]] )
+            eq_( 2, len( ai._refs ) )
+            eq_( len( full.seqs ), len( ai.seqs ) )
+
+    @raises( KeyError )
+    def test_missing_reference( self ):
+        AlignmentInfo( self.aipath, lazy=True ).load_reference( 'missing' )
@@ -5,7 +5,12 @@ import os.path
 import tempfile
 import shutil
 
-from ..alignmentinfo import AlignmentInfo, SeqAlignment, CoverageRegion as cr, BaseInfo, BadFormatException
+import numpy as np
+
+from ..alignmentinfo import AlignmentInfo, SeqAlignment, CoverageRegion as cr, BaseInfo, BadFormatException, \
+    ColumnarSeqAlignment, parse_columns, iter_alignments, segment_regions, BaseList, \
+    sweep_regions, SlottedBaseInfo, split_ranges, ThresholdPolicy, MedianPolicy, QualityPolicy, \
+    AlignmentInfoFollower
 
 import fixtures
 
@@ -17,6 +22,50 @@ class TestAlignmentInfo( object ):
             for projpath in projs: 
                 ai = AlignmentInfo( os.path.join( projpath, ptype, aifn ) ) 
 
+class TestIterAlignments( object ):
+    def test_same_as_alignmentinfo( self ):
+        ''' Streaming gives the same contigs in the same order '''
+        for ptype, projs in fixtures.GSPROJECTS.items():
+            for projpath in projs:
+                path = os.path.join( projpath, ptype, aifn )
+                ai = AlignmentInfo( path )
+                for columnar in (False, True):
+                    streamed = list( iter_alignments( path, columnar ) )
+                    eq_( [sa.name for sa in ai.seqs], [sa.name for sa in streamed] )
+                    eq_( [sa.regions for sa in ai.seqs], [sa.regions for sa in streamed] )
+
+    def test_is_lazy( self ):
+        ''' First contig is available before the rest of the file is parsed '''
+        path = os.path.join( fixtures.PATH, '05_11_2012_1_TI-MID10_PR_2357_AH3', 'mapping', aifn )
+        gen = iter_alignments( path )
+        eq_( AlignmentInfo( path ).seqs[0].name, next( gen ).name )
+        gen.close()
+
+class TestParallelParse( object ):
+    def test_split_ranges( self ):
+        ''' Every range starts on a > line and the ranges cover the file '''
+        path = os.path.join( fixtures.PATH, '05_11_2012_1_TI-MID10_PR_2357_AH3', 'mapping', aifn )
+        ranges = split_ranges( path, 8 )
+        eq_( 8, len( ranges ) )
+        eq_( 0, ranges[0][0] )
+        eq_( os.path.getsize( path ), ranges[-1][1] )
+        with open( path ) as fh:
+            for (start, end), (nstart, nend) in zip( ranges, ranges[1:] ):
+                eq_( end, nstart )
+                fh.seek( nstart )
+                eq_( '>', fh.read( 1 ) )
+
+    def test_same_as_serial( self ):
+        for ptype, projs in fixtures.GSPROJECTS.items():
+            for projpath in projs:
+                path = os.path.join( projpath, ptype, aifn )
+                ai = AlignmentInfo( path )
+                for columnar in (False, True):
+                    pai = AlignmentInfo( path, columnar=columnar, workers=3 )
+                    eq_( [(sa.name, sa.regions) for sa in ai.seqs], [(sa.name, sa.regions) for sa in pai.seqs] )
+                    eq_( sorted( ai._refs ), sorted( pai._refs ) )
+                    eq_( ai.merge_regions(), pai.merge_regions() )
+
 class TestMergeRegions( TestAlignmentInfo ):
     def test_mergeregions_fixedexamples( self ):
         '''
@@ -136,6 +185,332 @@ class TestMergeRegions( TestAlignmentInfo ):
             merged )
         os.unlink( '454AlignmentInfo.tsv' )
 
+class TestAlignmentInfoFollower( object ):
+    def setUp( self ):
+        self.tempdir = tempfile.mkdtemp()
+        self.path = os.path.join( self.tempdir, aifn )
+        with open( os.path.join( fixtures.PATH, '05_11_2012_1_TI-MID10_PR_2357_AH3', 'mapping', aifn ) ) as fh:
+            self.data = fh.read()
+
+    def tearDown( self ):
+        shutil.rmtree( self.tempdir )
+
+    def test_missing( self ):
+        eq_( [], AlignmentInfoFollower( self.path ).poll() )
+
+    def test_growing( self ):
+        ''' Polling while the file grows ends up the same as parsing the whole file '''
+        ai = AlignmentInfo( os.path.join( fixtures.PATH, '05_11_2012_1_TI-MID10_PR_2357_AH3', 'mapping', aifn ) )
+        for columnar in (False, True):
+            follower = AlignmentInfoFollower( self.path, columnar=columnar )
+            open( self.path, 'w' ).close()
+            seen = 0
+            # Append in chunks that end in the middle of lines
+            for i in range( 0, len( self.data ), 7919 ):
+                with open( self.path, 'a' ) as fh:
+                    fh.write( self.data[i:i+7919] )
+                new = follower.poll()
+                eq_( [sa.name for sa in ai.seqs[seen:seen+len( new )]], [sa.name for sa in new] )
+                seen += len( new )
+                eq_( seen, len( follower.seqs ) )
+            # Last block is not complete until the file is done
+            eq_( len( ai.seqs ) - 1, len( follower.seqs ) )
+            eq_( 1, len( follower.finish() ) )
+            eq_( [sa.regions for sa in ai.seqs], [sa.regions for sa in follower.seqs] )
+            eq_( ai.merge_regions(), follower.merge_regions() )
+            eq_( [], follower.poll() )
+
+    def test_partial_track( self ):
+        ''' Tracks are rebuilt after a poll adds to a reference '''
+        lines = self.data.splitlines( True )
+        headers = [i for i, line in enumerate( lines ) if line.startswith( '>' )]
+        with open( self.path, 'w' ) as fh:
+            fh.writelines( lines[:headers[2]] )
+        follower = AlignmentInfoFollower( self.path )
+        eq_( 1, len( follower.poll() ) )
+        ref = follower.seqs[0].name
+        length = len( follower.track( ref ) )
+        with open( self.path, 'w' ) as fh:
+            fh.writelines( lines )
+        follower.finish()
+        eq_( len( AlignmentInfo( self.path ).track( ref ) ), len( follower.track( ref ) ) )
+        assert length <= len( follower.track( ref ) )
+
+    def test_restarted( self ):
+        ''' File that was started over is parsed from the start again '''
+        with open( self.path, 'w' ) as fh:
+            fh.write( self.data )
+        follower = AlignmentInfoFollower( self.path )
+        follower.finish()
+        with open( self.path, 'w' ) as fh:
+            fh.write( '>Test 1\n1\tA\tA\t64\t1\t1\t1\t1.00\t0.01\n' )
+        follower.finish()
+        eq_( ['Test'], [sa.name for sa in follower.seqs] )
+
+class TestConsensus( object ):
+    def _loop_consensus( self, ai, ref, mask_below, mask_char='N', reference_coords=False ):
+        ''' Consensus built one base at a time '''
+        length = max( sa.lastPos for sa in ai[ref] )
+        # Base lines of every position and if the position is masked(from its first line)
+        lines = [[] for i in range( length )]
+        masked = [True] * length
+        seen = set()
+        for sa in ai[ref]:
+            for base in sa.bases.real_bases():
+                if base.pos not in seen:
+                    seen.add( base.pos )
+                    masked[base.pos-1] = base.adepth < mask_below
+                lines[base.pos-1].append( base.consb )
+        seq = []
+        for mask, bases in zip( masked, lines ):
+            if mask:
+                seq.append( mask_char )
+            elif reference_coords:
+                seq.append( bases[0] )
+            else:
+                seq += [b for b in bases if b != '-']
+        return ''.join( seq )
+
+    def test_same_as_loop( self ):
+        for ptype, projs in fixtures.GSPROJECTS.items():
+            for projpath in projs:
+                path = os.path.join( projpath, ptype, aifn )
+                ai = AlignmentInfo( path )
+                cai = AlignmentInfo( path, columnar=True )
+                for coords in (False, True):
+                    consensus = list( ai.consensus( reference_coords=coords ) )
+                    eq_( ai.references(), [ref for ref, seq in consensus] )
+                    eq_( consensus, list( cai.consensus( reference_coords=coords ) ) )
+                    for ref, seq in consensus:
+                        eq_( self._loop_consensus( ai, ref, 10, reference_coords=coords ), seq )
+                    for ref, seq in ai.consensus( mask_below=1, mask_char='?', reference_coords=coords ):
+                        eq_( self._loop_consensus( ai, ref, 1, '?', coords ), seq )
+
+    def test_indels( self ):
+        ''' Inserted bases are kept and deletions are removed unless in reference coordinates '''
+        tempdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join( tempdir, aifn )
+            with open( path, 'w' ) as fh:
+                fh.write( '\n'.join( [
+                    '>Test 1',
+                    '1\tA\tA\t64\t20\t20\t20\t1.00\t0.01',
+                    '2\tC\tC\t64\t20\t20\t20\t1.00\t0.01',
+                    '2\t-\tT\t64\t20\t20\t20\t1.00\t0.01',
+                    '3\tG\t-\t64\t20\t20\t20\t1.00\t0.01',
+                    '4\tT\tT\t64\t20\t20\t20\t1.00\t0.01',
+                    '6\tA\tA\t64\t20\t20\t20\t1.00\t0.01',
+                    '7\tA\tG\t64\t2\t2\t2\t1.00\t0.01',
+                ] ) + '\n' )
+            for columnar in (False, True):
+                ai = AlignmentInfo( path, columnar=columnar )
+                eq_( [('Test', 'ACTTNAN')], list( ai.consensus() ) )
+                eq_( [('Test', 'AC-TNAN')], list( ai.consensus( reference_coords=True ) ) )
+        finally:
+            shutil.rmtree( tempdir )
+
+    def _write( self, lines ):
+        path = os.path.join( self.tempdir, aifn )
+        with open( path, 'w' ) as fh:
+            fh.write( '\n'.join( lines ) + '\n' )
+        return path
+
+    def test_overlapping_contigs( self ):
+        ''' Positions two contigs cover use the first contig for bases and masking '''
+        self.tempdir = tempfile.mkdtemp()
+        try:
+            path = self._write( [
+                '>Test 1',
+                '1\tA\tA\t64\t20\t20\t20\t1.00\t0.01',
+                '2\tC\tC\t64\t20\t20\t20\t1.00\t0.01',
+                '3\tG\tG\t64\t20\t20\t20\t1.00\t0.01',
+                '>Test 2',
+                '2\tC\tT\t64\t3\t3\t3\t1.00\t0.01',
+                '3\tG\tT\t64\t30\t30\t30\t1.00\t0.01',
+            ] )
+            for columnar in (False, True):
+                ai = AlignmentInfo( path, columnar=columnar )
+                eq_( [20, 20, 20], ai.track( 'Test' ).adepth.tolist() )
+                eq_( [('Test', 'ACG')], list( ai.consensus() ) )
+                eq_( [('Test', 'ACG')], list( ai.consensus( reference_coords=True ) ) )
+        finally:
+            shutil.rmtree( self.tempdir )
+
+    def test_den2_insertion( self ):
+        ''' Position 588 of Den2 has a deletion line followed by the sample's T '''
+        path = os.path.join( fixtures.PATH, 'R03_548__TI46__Den2', 'mapping', aifn )
+        ai = AlignmentInfo( path, columnar=True )
+        ref, seq = next( ai.consensus() )
+        ref, refseq = next( ai.consensus( reference_coords=True ) )
+        assert '-' not in seq
+        assert '-' in refseq
+        eq_( '-', refseq[587] )
+        eq_( self._loop_consensus( ai, ref, 10 ), seq )
+
+    def test_write_consensus( self ):
+        from StringIO import StringIO
+        path = os.path.join( fixtures.PATH, 'R03_548__TI46__Den2', 'mapping', aifn )
+        ai = AlignmentInfo( path )
+        fh = StringIO()
+        eq_( 1, ai.write_consensus( fh, width=60 ) )
+        lines = fh.getvalue().splitlines()
+        ref, seq = next( ai.consensus() )
+        eq_( '>' + ref, lines[0] )
+        eq_( seq, ''.join( lines[1:] ) )
+        eq_( [60] * (len( lines ) - 2), [len( l ) for l in lines[1:-1]] )
+
+class TestColumnarAlignmentInfo( object ):
+    def test_same_as_objects( self ):
+        ''' Columnar parse gives the same regions and bases as the BaseInfo parse '''
+        for ptype, projs in fixtures.GSPROJECTS.items():
+            for projpath in projs:
+                path = os.path.join( projpath, ptype, aifn )
+                ai = AlignmentInfo( path )
+                cai = AlignmentInfo( path, columnar=True )
+                eq_( len( ai.seqs ), len( cai.seqs ) )
+                for sa, csa in zip( ai.seqs, cai.seqs ):
+                    assert isinstance( csa, ColumnarSeqAlignment )
+                    eq_( sa.name, csa.name )
+                    eq_( sa.regions, csa.regions )
+                    eq_( [str(b) for b in sa.bases], [str(b) for b in csa.bases] )
+                eq_( ai.merge_regions(), cai.merge_regions() )
+                eq_( ai.seqs[0].name, cai[ai.seqs[0].name][0].name )
+
+    def test_getitem( self ):
+        ''' Indexing by position materializes the bases at that position '''
+        csa = ColumnarSeqAlignment( [
+            '>Test 3',
+            '3\tA\tA\t64\t1\t11\t11\t1.00\t0.01',
+            '3\tA\tA\t64\t1\t11\t11\t1.00\t0.01',
+            '4\tA\tC\t64\t1\t1\t1\t1.00\t0.01',
+        ] )
+        eq_( 2, len( csa[3] ) )
+        eq_( 'C', csa[4][0].consb )
+        eq_( 'Gap', csa[1][0].gapType )
+        eq_( [cr(1,2,'Gap'),cr(3,3,'Normal'),cr(4,4,'LowCoverage')], csa.regions )
+        assert csa.ismapping
+        assert csa.adepth.dtype.kind == 'i'
+
+    def test_assembly_columns( self ):
+        cols = parse_columns( ['1\tA\t64\t1\t1\t1.00\t0.01'] )
+        assert 'refb' not in cols and 'tdepth' not in cols
+        eq_( 1, cols['pos'][0] )
+
+    @raises( BadFormatException )
+    def test_badcolumns( self ):
+        parse_columns( ['1\tA\t64\t1'] )
+
+    @raises( ValueError )
+    def test_badnucleotide( self ):
+        parse_columns( ['1\tZ\tA\t64\t1\t1\t1\t1.00\t0.01'] )
+
+class TestSegmentRegions( object ):
+    def test_segments( self ):
+        ''' Leading gap, gaps, type changes and indels sharing a position '''
+        pos = [3, 4, 4, 5, 9, 10, 11]
+        low = [False, False, True, True, True, False, False]
+        eq_( [
+                cr(1,2,'Gap'),
+                cr(3,3,'Normal'),
+                cr(4,5,'LowCoverage'),
+                cr(6,8,'Gap'),
+                cr(9,9,'LowCoverage'),
+                cr(10,11,'Normal'),
+            ], segment_regions( pos, low, 1, 3 ) )
+
+    def test_nobases( self ):
+        eq_( [cr(1,4,'Gap')], segment_regions( [], [], 1, 5 ) )
+
+    @raises( BadFormatException )
+    def test_unordered( self ):
+        segment_regions( [2, 1], [False, False], 1, 1 )
+
+class TestCoveragePolicy( object ):
+    lines = [
+        '>Test 1',
+        '1\tA\tA\t64\t1\t5\t5\t1.00\t0.01',
+        '2\tA\tA\t64\t1\t15\t15\t1.00\t0.01',
+        '3\tA\tA\t12\t1\t40\t40\t1.00\t0.01',
+        '4\tA\tA\t64\t1\t40\t40\t1.00\t0.01',
+    ]
+
+    def test_default( self ):
+        ''' Same as LowCoverageCalc '''
+        for cls in (SeqAlignment, ColumnarSeqAlignment):
+            eq_( [cr(1,1,'LowCoverage'),cr(2,4,'Normal')], cls( self.lines ).regions )
+        eq_( 'LowCoverage', SeqAlignment( self.lines )[1][0].gapType )
+
+    def test_per_reference( self ):
+        policy = ThresholdPolicy( 10, {'Test': 20} )
+        eq_( [True, True, False], policy.classify( 'Test', [5, 15, 40] ).tolist() )
+        eq_( [True, False, False], policy.classify( 'Other', [5, 15, 40] ).tolist() )
+        for cls in (SeqAlignment, ColumnarSeqAlignment):
+            eq_( [cr(1,2,'LowCoverage'),cr(3,4,'Normal')], cls( self.lines, policy=policy ).regions )
+        eq_( 'LowCoverage', SeqAlignment( self.lines, policy=policy )[2][0].gapType )
+
+    def test_median( self ):
+        # Median of covered bases is 27.5 so the threshold is 13.75
+        eq_( [True, False, False, False], MedianPolicy( 0.5 ).classify( 'Test', [5, 15, 40, 40] ).tolist() )
+        eq_( [True, True], MedianPolicy( 0.5 ).classify( 'Test', [0, 0] ).tolist() )
+        eq_( 20, MedianPolicy( 0.1, minimum=20 ).threshold( 'Test', np.array( [100] ) ) )
+
+    def test_quality( self ):
+        policy = QualityPolicy( ThresholdPolicy( 10 ), minqual=20 )
+        eq_( [True, False, True], policy.classify( 'Test', [5, 15, 40], [64, 64, 12] ).tolist() )
+        for cls in (SeqAlignment, ColumnarSeqAlignment):
+            eq_( [cr(1,1,'LowCoverage'),cr(2,2,'Normal'),cr(3,3,'LowCoverage'),cr(4,4,'Normal')],
+                cls( self.lines, policy=policy ).regions )
+
+    def test_apply_policy( self ):
+        ''' Reference wide policies classify across every contig of the reference '''
+        path = os.path.join( fixtures.PATH, '05_11_2012_1_TI-MID10_PR_2357_AH3', 'mapping', aifn )
+        for columnar in (False, True):
+            ai = AlignmentInfo( path, columnar=columnar, policy=MedianPolicy( 0.5 ) )
+            for ref, sas in ai._refs.items():
+                adepth = np.concatenate( [sa.column( 'adepth' ) for sa in sas] )
+                lowmask = MedianPolicy( 0.5 ).classify( ref, adepth )
+                bases = [b for sa in sas for b in sa.bases.real_bases()]
+                eq_( lowmask.tolist(), [b.gapType == 'LowCoverage' for b in bases] )
+            # Going back to the default policy gives the original regions
+            ai.apply_policy( ThresholdPolicy() )
+            eq_( [sa.regions for sa in AlignmentInfo( path ).seqs], [sa.regions for sa in ai.seqs] )
+
+class TestSweepRegions( object ):
+    def test_precedence( self ):
+        ''' Normal beats LowCoverage beats Gap when any number of regions overlap '''
+        regions = [
+            cr( 1, 20, 'Gap' ),
+            cr( 3, 10, 'LowCoverage' ),
+            cr( 5, 6, 'Normal' ),
+            cr( 8, 15, 'LowCoverage' ),
+            cr( 9, 9, 'Normal' ),
+        ]
+        eq_( [
+                cr( 1, 2, 'Gap' ),
+                cr( 3, 4, 'LowCoverage' ),
+                cr( 5, 6, 'Normal' ),
+                cr( 7, 8, 'LowCoverage' ),
+                cr( 9, 9, 'Normal' ),
+                cr( 10, 15, 'LowCoverage' ),
+                cr( 16, 20, 'Gap' ),
+            ], sweep_regions( regions ) )
+
+    def test_does_not_modify( self ):
+        regions = [cr( 1, 5, 'Gap' ), cr( 3, 7, 'Normal' )]
+        sweep_regions( regions )
+        eq_( [cr( 1, 5, 'Gap' ), cr( 3, 7, 'Normal' )], regions )
+
+    def test_not_adjacent( self ):
+        ''' Uncovered positions are left out instead of raising an error '''
+        eq_( [cr( 1, 2, 'Gap' ), cr( 4, 5, 'Gap' )],
+            sweep_regions( [cr( 4, 5, 'Gap' ), cr( 1, 2, 'Gap' )] ) )
+
+    def test_adjacent_same_type( self ):
+        eq_( [cr( 1, 5, 'Gap' )], sweep_regions( [cr( 1, 3, 'Gap' ), cr( 4, 5, 'Gap' )] ) )
+
+    def test_empty( self ):
+        eq_( [], sweep_regions( [] ) )
+
 class TestCreateCoverageRegion( object ):
     def rgr( self, gapType ):
         ''' Random gap region '''
@@ -157,6 +532,41 @@ class TestCreateCoverageRegion( object ):
         ''' Create a valid low coverage region '''
         self.rgr( 'LowCoverage' )
 
+class TestGapRanges( object ):
+    def setUp( self ):
+        self.sa = SeqAlignment( [
+            '>bob 10001',
+            '10001\tA\tA\t64\t1\t11\t11\t1.00\t0.01',
+            '20001\tA\tA\t64\t1\t11\t11\t1.00\t0.01',
+        ] )
+
+    def test_gaps_are_ranges( self ):
+        ''' Large gaps do not create a base per position '''
+        eq_( 20001, len( self.sa.bases ) )
+        eq_( [(1,10000),(10002,20000)], [(g.start, g.end) for g in self.sa.bases.gaps] )
+        eq_( 2, len( list( self.sa.bases.real_bases() ) ) )
+
+    def test_index_gap( self ):
+        ''' Gap bases are created when indexed '''
+        eq_( 'Gap', self.sa.bases[0].gapType )
+        eq_( 10000, self.sa.bases[9999].pos )
+        eq_( 10001, self.sa.bases[10000].pos )
+        eq_( 10002, self.sa.bases[10001].pos )
+        eq_( 20001, self.sa.bases[-1].pos )
+        eq_( 5, self.sa[5][0].pos )
+        eq_( 'Gap', self.sa[15000][0].gapType )
+
+    def test_baselist( self ):
+        bl = BaseList()
+        bl.add_gap( 1, 3 )
+        bl.append( BaseInfo( '4\tA\tA\t64\t1\t11\t11\t1.00\t0.01' ) )
+        eq_( [1, 2, 3, 4], [b.pos for b in bl] )
+        eq_( [3, 4], [b.pos for b in bl[2:]] )
+
+    @raises( IndexError )
+    def test_baselist_index( self ):
+        BaseList()[0]
+
 class TestSeqAlignParse( object ):
     @classmethod
     def setUpClass( self ):
@@ -205,6 +615,56 @@ class TestSeqAlignParse( object ):
         eq_( self.expected_regions, sa.regions )
         eq_( [cr(13,20,'Gap')] + self.expected_regions2, sa2.regions )
 
+class TestPositionIndex( object ):
+    def setUp( self ):
+        self.sa = SeqAlignment( [
+            '>Test 3',
+            '3\tA\tA\t64\t1\t12\t12\t1.00\t0.01',
+            '4\tA\tC\t64\t1\t2\t2\t1.00\t0.01',
+            '4\tA\tT\t64\t1\t5\t5\t1.00\t0.01',
+            '4\tA\tG\t64\t1\t6\t6\t1.00\t0.01',
+            '7\tA\tA\t64\t1\t8\t8\t1.00\t0.01',
+        ] )
+
+    def test_lookup( self ):
+        ''' Every base at a position in file order and gap bases in between '''
+        eq_( ['C','T','G'], [b.consb for b in self.sa[4]] )
+        eq_( [12], [b.adepth for b in self.sa[3]] )
+        eq_( [8], [b.adepth for b in self.sa[7]] )
+        eq_( ['Gap'], [b.gapType for b in self.sa[1]] )
+        eq_( ['Gap'], [b.gapType for b in self.sa[5]] )
+
+    @raises( KeyError )
+    def test_missing( self ):
+        self.sa[8]
+
+    def test_add_base( self ):
+        ''' Index is rebuilt after bases are added even out of order '''
+        self.sa[3]
+        self.sa.add_base( BaseInfo( '2\tA\tA\t64\t1\t20\t20\t1.00\t0.01' ) )
+        self.sa.add_base( BaseInfo( '7\tA\tT\t64\t1\t21\t21\t1.00\t0.01' ) )
+        eq_( [20], [b.adepth for b in self.sa[2]] )
+        eq_( [8, 21], [b.adepth for b in self.sa[7]] )
+        eq_( ['C','T','G'], [b.consb for b in self.sa[4]] )
+
+    def test_gap_at( self ):
+        ''' Gaps are found by bisect the same as scanning every gap '''
+        bases = self.sa.bases
+        bases.add_gap( 20, 25 )
+        bases.add_gap( 10, 12 )
+        for pos in range( 0, 30 ):
+            expected = [gap for gap in bases.gaps if pos in gap]
+            eq_( expected[0] if expected else None, bases.gap_at( pos ) )
+        eq_( ['Gap'], [b.gapType for b in self.sa[11]] )
+
+    def test_fixture_gaps( self ):
+        path = os.path.join( fixtures.PATH, 'R03_548__TI46__Den2', 'mapping', aifn )
+        for sa in AlignmentInfo( path ).seqs:
+            for gap in sa.bases.gaps:
+                for pos in (gap.start, gap.end):
+                    eq_( gap, sa.bases.gap_at( pos ) )
+                    eq_( pos, sa[pos][0].pos )
+
 
 class TestBaseInfo( object ):
     def setUp( self ):
@@ -298,6 +758,24 @@ class TestBaseInfo( object ):
         bi = BaseInfo( self.lines['assm_line'] )
         assert len( str( bi ).split( '\t' ) ) == 7
 
+    def test_from_fields( self ):
+        ''' Trusted constructor gives the same base as parsing the line '''
+        bi = BaseInfo( self.lines['map_line'] )
+        fbi = BaseInfo.from_fields( 1, 'A', 'A', 1, 1, 1, 1, 1.0, 0.01 )
+        eq_( str( bi ), str( fbi ) )
+        eq_( 'LowCoverage', fbi.gapType )
+        abi = BaseInfo.from_fields( 1, None, 'A', 1, 1, 1, None, 1.0, 0.01 )
+        eq_( str( BaseInfo( self.lines['assm_line'] ) ), str( abi ) )
+        assert not hasattr( abi, 'refb' )
+
+    def test_slotted( self ):
+        ''' SlottedBaseInfo has no __dict__ but still validates when parsing '''
+        bi = SlottedBaseInfo( self.lines['map_line'] )
+        assert not hasattr( bi, '__dict__' )
+        eq_( str( BaseInfo( self.lines['map_line'] ) ), str( bi ) )
+        self.t_agtz( bi, 'adepth', False )
+        eq_( 'Gap', SlottedBaseInfo.gapBase( 5 ).gapType )
+
 class TestCoverageRegion( object ):
     def test_merge_leftequal( self ):
         ''' Left ends are equal but right ends do not. Diff rtype '''
@@ -0,0 +1,75 @@
+from nose.tools import eq_
+import os.path
+from StringIO import StringIO
+
+from ..alignmentinfo import AlignmentInfo, CoverageRegion as cr
+from ..bedexport import bed_lines, write_bed, stream_bed, write_bedgraph, stream_bedgraph, BedGraphWriter
+
+import fixtures
+
+def paths():
+    for ptype, projs in fixtures.GSPROJECTS.items():
+        for projpath in projs:
+            yield os.path.join( projpath, ptype, '454AlignmentInfo.tsv' )
+
+def expand( bedgraph ):
+    ''' Per reference depth list from bedGraph lines '''
+    depths = {}
+    for line in bedgraph.splitlines():
+        ref, start, end, value = line.split( '\t' )
+        depth = depths.setdefault( ref, [] )
+        eq_( len( depth ), int( start ) )
+        depth += [int( value )] * (int( end ) - int( start ))
+    return depths
+
+class TestBed( object ):
+    def test_lines( self ):
+        regions = [cr(1,5,'Gap'), cr(6,6,'LowCoverage'), cr(7,10,'Normal')]
+        eq_( ['ref\t0\t5\tGap', 'ref\t5\t6\tLowCoverage', 'ref\t6\t10\tNormal'], bed_lines( 'ref', regions ) )
+        eq_( ['ref\t5\t6\tLowCoverage'], bed_lines( 'ref', regions, ('LowCoverage',) ) )
+
+    def test_stream_same( self ):
+        ''' Streaming writes the same as writing merge_regions '''
+        for path in paths():
+            ai = AlignmentInfo( path )
+            merged = ai.merge_regions()
+            expected = StringIO()
+            count = write_bed( expected, [(ref, merged[ref]) for ref in ai.references()] )
+            streamed = StringIO()
+            eq_( count, stream_bed( path, streamed ) )
+            eq_( expected.getvalue(), streamed.getvalue() )
+
+class TestBedGraph( object ):
+    def test_depth( self ):
+        ''' Collapsed and per base bedGraph both expand back to the track depth '''
+        for path in paths():
+            ai = AlignmentInfo( path, columnar=True )
+            for collapse in (True, False):
+                fh = StringIO()
+                count = write_bedgraph( fh, ai, collapse )
+                eq_( count, len( fh.getvalue().splitlines() ) )
+                depths = expand( fh.getvalue() )
+                eq_( sorted( ai.references() ), sorted( depths ) )
+                for ref in ai.references():
+                    eq_( ai.track( ref ).adepth.tolist(), depths[ref] )
+
+    def test_collapsed( self ):
+        ''' Adjacent lines never have the same depth '''
+        fh = StringIO()
+        writer = BedGraphWriter( fh )
+        writer.add( 'ref', [2, 3, 3, 4], [5, 5, 9, 6] )
+        writer.add( 'ref', [6, 7], [6, 0] )
+        writer.add( 'other', [1], [1] )
+        writer.flush()
+        eq_( 'ref\t0\t1\t0\nref\t1\t3\t5\nref\t3\t4\t6\nref\t4\t5\t0\nref\t5\t6\t6\nref\t6\t7\t0\nother\t0\t1\t1\n',
+            fh.getvalue() )
+
+    def test_stream_same( self ):
+        for path in paths():
+            ai = AlignmentInfo( path, columnar=True )
+            for collapse in (True, False):
+                expected = StringIO()
+                write_bedgraph( expected, ai, collapse )
+                streamed = StringIO()
+                stream_bedgraph( path, streamed, collapse )
+                eq_( expected.getvalue(), streamed.getvalue() )
@@ -0,0 +1,202 @@
+from nose.tools import eq_, raises
+import os
+import os.path
+import tempfile
+import shutil
+
+import numpy as np
+
+from ..alignmentinfo import AlignmentInfo, SeqAlignment, ColumnarSeqAlignment, ThresholdPolicy, iter_binned_depth
+from ..coverage import ReferenceTrack, RangeStats, DepthBinner, binned_depth, track_diff, \
+    homopolymer_flags, position_runs
+
+import fixtures
+
+def alignment( cls=SeqAlignment ):
+    return cls( [
+        '>Test 3',
+        '3\tA\tA\t20\t1\t12\t12\t1.00\t0.01',
+        '4\tA\tC\t30\t1\t2\t2\t1.00\t0.01',
+        '4\tA\tT\t30\t1\t5\t5\t1.00\t0.01',
+        '5\tA\tG\t40\t1\t30\t30\t1.00\t0.01',
+        '7\tA\tA\t50\t1\t8\t8\t1.00\t0.01',
+    ] )
+
+class TestReferenceTrack( object ):
+    def test_track( self ):
+        ''' First base at every position and zero depth where not covered '''
+        for cls in (SeqAlignment, ColumnarSeqAlignment):
+            track = ReferenceTrack( 'Test', [alignment( cls )] )
+            eq_( 7, len( track ) )
+            eq_( [0, 0, 12, 2, 30, 0, 8], track.adepth.tolist() )
+            eq_( [False, False, True, True, True, False, True], track.covered.tolist() )
+            eq_( 'C', track.consb[3] )
+
+class TestRangeStats( object ):
+    def test_query( self ):
+        track = ReferenceTrack( 'Test', [alignment()] )
+        stats = RangeStats( track, track.adepth < 10 )
+        eq_( {
+                'mean_depth': 44 / 3.0,
+                'min_depth': 2,
+                'max_depth': 30,
+                'frac_low': 1 / 3.0,
+                'mean_qual': 30.0,
+            }, stats.query( 3, 5 ) )
+        r = stats.query( 6, 9 )
+        eq_( (0, 8, 1.0, 50.0), (r['min_depth'], r['max_depth'], r['frac_low'], r['mean_qual']) )
+        eq_( 0.0, stats.query( 20, 30 )['mean_depth'] )
+
+    def test_against_loop( self ):
+        ''' Same answers as looping over the bases '''
+        ai = AlignmentInfo( os.path.join( fixtures.PATH, 'R03_548__TI46__Den2', 'mapping', '454AlignmentInfo.tsv' ), columnar=True )
+        ref = 'Den2/FJ810410_1/Thailand/2001/Den2_1'
+        depth = ai.track( ref ).adepth
+        for start, end in ((1, 1), (1, 100), (8000, 8100), (9900, 10175), (57, 4113)):
+            window = depth[start-1:end]
+            stats = ai.region_stats( ref, start, end )
+            eq_( window.min(), stats['min_depth'] )
+            eq_( window.max(), stats['max_depth'] )
+            assert abs( window.mean() - stats['mean_depth'] ) < 1e-9
+            assert abs( (window < 10).mean() - stats['frac_low'] ) < 1e-9
+
+    def test_policy( self ):
+        ''' frac_low comes from the AlignmentInfo's policy '''
+        ai = AlignmentInfo( os.path.join( fixtures.PATH, 'R03_548__TI46__Den2', 'mapping', '454AlignmentInfo.tsv' ),
+            columnar=True, policy=ThresholdPolicy( 1000 ) )
+        ref = 'Den2/FJ810410_1/Thailand/2001/Den2_1'
+        depth = ai.track( ref ).adepth
+        assert abs( (depth[:100] < 1000).mean() - ai.region_stats( ref, 1, 100 )['frac_low'] ) < 1e-9
+
+    def test_blocks( self ):
+        ''' Windows inside, across and at the edges of min/max blocks '''
+        class Track( object ):
+            def __init__( self, depth ):
+                self.adepth = depth
+                self.covered = depth > 0
+                self.qual = np.zeros( len( depth ), dtype=np.int64 )
+            def __len__( self ):
+                return len( self.adepth )
+        depth = np.random.RandomState( 1 ).randint( 0, 1000, 1000 )
+        stats = RangeStats( Track( depth ), depth < 10 )
+        windows = [(1, 1), (1, 128), (128, 129), (100, 300), (129, 256), (5, 999), (1, 1000), (900, 1000), (257, 1200)]
+        for start, end in windows:
+            window = depth[start-1:end]
+            r = stats.query( start, end )
+            eq_( window.min() if end <= 1000 else 0, r['min_depth'] )
+            eq_( window.max(), r['max_depth'] )
+
+    def test_lazyextremes( self ):
+        ''' Min/max tables are only built when they are asked for '''
+        track = ReferenceTrack( 'Test', [alignment()] )
+        stats = RangeStats( track, track.adepth < 10 )
+        r = stats.query( 3, 5, extremes=False )
+        assert 'min_depth' not in r and 'max_depth' not in r
+        assert stats._min is None
+        eq_( 2, stats.query( 3, 5 )['min_depth'] )
+        assert stats._min is not None
+
+    @raises( ValueError )
+    def test_badregion( self ):
+        track = ReferenceTrack( 'Test', [alignment()] )
+        RangeStats( track, track.adepth < 10 ).query( 5, 4 )
+
+class TestBinnedDepth( object ):
+    def test_bins( self ):
+        track = ReferenceTrack( 'Test', [alignment()] )
+        bins = binned_depth( track.adepth, 3 )
+        eq_( [1, 4, 7], bins['start'].tolist() )
+        eq_( [3, 6, 7], bins['end'].tolist() )
+        eq_( [12 / 3.0, 32 / 3.0, 8.0], bins['mean'].tolist() )
+        eq_( [0, 0, 8], bins['min'].tolist() )
+        eq_( [12, 30, 8], bins['max'].tolist() )
+
+    def test_empty( self ):
+        eq_( [], binned_depth( [], 10 )['mean'].tolist() )
+        eq_( [], DepthBinner( 10 ).bins()['mean'].tolist() )
+
+    @raises( ValueError )
+    def test_badsize( self ):
+        binned_depth( [1, 2], 0 )
+
+    def test_streaming_same( self ):
+        ''' Streaming bins are the same as the bins of the full track '''
+        for ptype, projs in fixtures.GSPROJECTS.items():
+            for projpath in projs:
+                path = os.path.join( projpath, ptype, '454AlignmentInfo.tsv' )
+                ai = AlignmentInfo( path, columnar=True )
+                streamed = list( iter_binned_depth( path, 100 ) )
+                eq_( ai.references(), [ref for ref, bins in streamed] )
+                for ref, bins in streamed:
+                    expected = ai.binned_depth( ref, 100 )
+                    for key in ('start', 'end', 'mean', 'min', 'max'):
+                        eq_( expected[key].tolist(), bins[key].tolist() )
+
+class TestDiff( object ):
+    def test_track_diff( self ):
+        track = ReferenceTrack( 'Test', [alignment()] )
+        eq_( None, track_diff( track, track ) )
+        other = ReferenceTrack( 'Test', [SeqAlignment( [
+            '>Test 3',
+            '3\tA\tA\t20\t1\t12\t12\t1.00\t0.01',
+            '4\tA\tA\t30\t1\t3\t3\t1.00\t0.01',
+            '5\tA\tG\t40\t1\t30\t30\t1.00\t0.01',
+            '6\tA\tG\t40\t1\t30\t30\t1.00\t0.01',
+        ] )] )
+        diff = track_diff( track, other )
+        eq_( [4, 6, 7], diff['positions'].tolist() )
+        eq_( [1, 30, -8], diff['depth_delta'].tolist() )
+        eq_( ['C', '-', 'A'], diff['consb'].tolist() )
+        eq_( ['A', 'G', '-'], diff['other_consb'].tolist() )
+        eq_( [(4, 4), (6, 7)], diff['regions'] )
+        # Small depth changes can be ignored
+        eq_( [4, 6, 7], track_diff( track, other, 10 )['positions'].tolist() )
+        eq_( None, track_diff( track, ReferenceTrack( 'Test', [alignment()] ), 10 ) )
+
+    def test_diff( self ):
+        ''' Only the changed references and positions '''
+        src = os.path.join( fixtures.PATH, '05_11_2012_1_TI-MID10_PR_2357_AH3', 'mapping', '454AlignmentInfo.tsv' )
+        tempdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join( tempdir, '454AlignmentInfo.tsv' )
+            with open( src ) as fh:
+                lines = fh.readlines()
+            # Change the depth of the first base of the first contig
+            header = [i for i, line in enumerate( lines ) if line.startswith( '>' )][0]
+            cols = lines[header+1].split( '\t' )
+            cols[5] = str( int( cols[5] ) + 7 )
+            lines[header+1] = '\t'.join( cols )
+            with open( path, 'w' ) as fh:
+                fh.writelines( lines )
+            ai = AlignmentInfo( src, columnar=True )
+            other = AlignmentInfo( path )
+            eq_( {}, ai.diff( AlignmentInfo( src ) ) )
+            diff = ai.diff( other )
+            ref = lines[header].split()[0][1:]
+            eq_( [ref], diff.keys() )
+            eq_( [int( cols[0] )], diff[ref]['positions'].tolist() )
+            eq_( [7], diff[ref]['depth_delta'].tolist() )
+        finally:
+            shutil.rmtree( tempdir )
+
+class TestHomopolymerFlags( object ):
+    def test_runs( self ):
+        eq_( [], position_runs( [] ) )
+        eq_( [(1, 3), (5, 5), (9, 10)], position_runs( [1, 2, 3, 5, 9, 10] ) )
+
+    def test_same_as_loop( self ):
+        ''' Same positions as checking every BaseInfo '''
+        for ptype, projs in fixtures.GSPROJECTS.items():
+            for projpath in projs:
+                path = os.path.join( projpath, ptype, '454AlignmentInfo.tsv' )
+                ai = AlignmentInfo( path )
+                expected = {}
+                for sa in ai.seqs:
+                    for base in sa.bases.real_bases():
+                        if abs( base.signal - round( base.signal ) ) > 0.3 + 1e-6 or base.stddev > 0.3 + 1e-6:
+                            expected.setdefault( sa.name, set() ).add( base.pos )
+                flags = ai.homopolymer_flags()
+                eq_( sorted( expected ), sorted( flags ) )
+                for ref, positions in expected.items():
+                    eq_( position_runs( sorted( positions ) ), flags[ref] )
+                eq_( flags, AlignmentInfo( path, columnar=True ).homopolymer_flags() )
@@ -1,6 +1,7 @@
 import nose
 
-from ..diffs import Diffs, DiffVariant
+from ..diffs import Diffs, DiffVariant, DiffFilter
+from StringIO import StringIO
 import os
 import os.path
 import glob
@@ -53,6 +54,98 @@ class TestDiffs( object ):
         d = Diffs( self.example_files['454AllDiffs.txt'] )
         assert isinstance( d.variants[0], DiffVariant ), type( d.variants[0] )
 
+class TestDiffFilter( object ):
+    def setUp( self ):
+        self.path = os.path.join( example_files_dir, '454AllDiffs.txt' )
+        self.all = Diffs( self.path ).variants
+
+    def filtertest( self, where, keep ):
+        got = [(v.reference_accno, v.start_pos, v.end_pos) for v in Diffs( self.path, where=where ).variants]
+        expected = [(v.reference_accno, v.start_pos, v.end_pos) for v in self.all if keep( v )]
+        print 'Got: {}'.format( got )
+        print 'Expected: {}'.format( expected )
+        assert got == expected
+
+    def test_nofilter( self ):
+        self.filtertest( DiffFilter(), lambda v: True )
+
+    def test_minfreq( self ):
+        self.filtertest( DiffFilter( min_freq='90%' ), lambda v: v._var_freq >= 90 )
+
+    def test_mindepth( self ):
+        self.filtertest( DiffFilter( min_depth=100 ), lambda v: v.total_depth >= 100 )
+
+    def test_references( self ):
+        ref = self.all[-1].reference_accno
+        self.filtertest( DiffFilter( references=[ref.lstrip( '>' )] ), lambda v: v.reference_accno == ref )
+
+    def test_window( self ):
+        self.filtertest( DiffFilter( window=(100, 500) ), lambda v: v.end_pos >= 100 and v.start_pos <= 500 )
+
+    def test_combined( self ):
+        self.filtertest( DiffFilter( min_freq=20, min_depth=50, window=(1, 1000) ),
+            lambda v: v._var_freq >= 20 and v.total_depth >= 50 and v.start_pos <= 1000 )
+
+    def test_lineskept( self ):
+        where = DiffFilter( min_depth=100 )
+        expected = [v.lines for v in self.all if v.total_depth >= 100]
+        assert [v.lines for v in Diffs( self.path, where=where ).variants] == expected
+
+class TestDiffTable( object ):
+    def setUp( self ):
+        self.paths = glob.glob( os.path.join( example_files_dir, '*Diffs.txt' ) )
+
+    def test_matchesvariants( self ):
+        for path in self.paths:
+            d = Diffs( path )
+            table = d.to_table()
+            for name in ('reference_accno', 'start_pos', 'end_pos', 'ref_nuc', 'var_nuc', 'total_depth'):
+                assert table[name].tolist() == [getattr( v, name ) for v in d.variants], name
+            assert table['var_freq'].tolist() == [v._var_freq for v in d.variants]
+            assert table['start_pos'].dtype.kind == 'i'
+
+    def test_readtable( self ):
+        for path in self.paths:
+            expected = Diffs( path ).to_table()
+            table = Diffs.read_table( path )
+            assert sorted( table ) == sorted( expected )
+            for name in table:
+                assert table[name].tolist() == expected[name].tolist(), name
+
+    def test_readtablenovariants( self ):
+        d = Diffs( self.paths[0], build=False )
+        assert d.variants == []
+        assert len( d.to_table()['start_pos'] )
+
+    def test_readtablewhere( self ):
+        path = os.path.join( example_files_dir, '454AllDiffs.txt' )
+        where = DiffFilter( min_depth=100 )
+        table = Diffs.read_table( path, where )
+        assert table['start_pos'].tolist() == [v.start_pos for v in Diffs( path, where ).variants]
+        assert (table['total_depth'] >= 100).all()
+
+    def test_emptytable( self ):
+        hdr = '>Reference\tStart\tEnd\tRef\tVar\tTotal\tVar\n>Accno\tPos\tPos\tNuc\tNuc\tDepth\tFreq\n'
+        table = Diffs.read_table( StringIO( hdr ) )
+        assert len( table ) == 7
+        assert all( len( col ) == 0 for col in table.values() )
+        assert table['var_freq'].dtype == float
+
+class TestDiffOverlapping( object ):
+    def test_matchesscan( self ):
+        for path in glob.glob( os.path.join( example_files_dir, '*Diffs.txt' ) ):
+            d = Diffs( path )
+            for ref in d.keys():
+                for start, end in ((1, 1), (7, 7), (1, 100), (20, 30), (500, 2000), (5000, 6000)):
+                    got = d.overlapping( ref, start, end )
+                    expected = sorted( [v for v in d[ref] if v.start_pos <= end and v.end_pos >= start],
+                        key=lambda v: (v.start_pos, v.end_pos) )
+                    assert got == expected, (ref, start, end)
+
+    def test_missingref( self ):
+        d = Diffs( os.path.join( example_files_dir, '454HCDiffs.txt' ) )
+        assert d.overlapping( 'missing', 1, 100 ) == []
+
 class TestDiffVariant( object ):
     def argtest( self, args ):
         dv = DiffVariant( **args )
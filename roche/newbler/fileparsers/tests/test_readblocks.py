@@ -0,0 +1,105 @@
+import nose
+
+from ..readblocks import AccessionTable, ReadAlignments, parse_read_line, parse_read_block, read_support_table
+from ..diffs import Diffs, DiffVariant
+
+import os.path
+from glob import glob
+
+this_dir = os.path.dirname( os.path.abspath( __file__ ) )
+example_files_dir = os.path.join( this_dir, 'example_files' )
+
+block = '''Reads with Difference:
+reference                     1+ ATGGATTCCAA-CACTGTGTCAAG-TT 25
+                                       *
+H52E4QC02GX5AX              858- ATGGAT-CCAAACACTGTGTCAAGCTT 833
+H52E4QC02G8I0I  (2)         848- ATGGAT-CCAAACACTGTGTCAAGCTT 823
+H52E4QC02JDTXH              185+ ATGGAT-CCAAACACTGTGTCAAGCTT 210
+                                       *
+Other Reads:
+                                       *
+H52E4QC02IFXP3              122+ ATGGATTCCAA-CACTGTGTCAAG-TT 146
+H52E4QC02GX5AX  (296)        15+       TCCAA-CACTGTGTCAAG-TT 39
+                                       *
+Signal Distribution:
+TOTAL: 0'''.splitlines()
+
+class TestAccessionTable( object ):
+    def test_intern( self ):
+        t = AccessionTable()
+        assert t.intern( 'a' ) == 0
+        assert t.intern( 'b' ) == 1
+        assert t.intern( 'a' ) == 0
+        assert len( t ) == 2
+        assert t[1] == 'b'
+
+class TestParseReadLine( object ):
+    def test_nodups( self ):
+        t = AccessionTable()
+        r = parse_read_line( 'H52E4QC02GX5AX              858- ATGGAT-CCAAACACTGTGTCAAGCTT 833', t )
+        assert r == (0, True, 858, 833, 1), r
+        assert t[0] == 'H52E4QC02GX5AX'
+
+    def test_dups( self ):
+        r = parse_read_line( 'H52E4QC02IZF1F  (296)        15+ ATGGATTCCAA-CACTGTGTCAAG-TT 39', AccessionTable() )
+        assert r == (0, False, 15, 39, 296), r
+
+    def test_invalid( self ):
+        for line in ('TOTAL: 0', 'H52E4QC02IZF1F 15 ATGG 39', 'a b c d e f'):
+            try:
+                parse_read_line( line, AccessionTable() )
+                assert False, 'Did not raise ValueError for {}'.format( line )
+            except ValueError:
+                pass
+
+class TestParseReadBlock( object ):
+    def test_sections( self ):
+        reads, other = parse_read_block( block )
+        assert isinstance( reads, ReadAlignments )
+        assert reads.accessions == ['H52E4QC02GX5AX', 'H52E4QC02G8I0I', 'H52E4QC02JDTXH']
+        assert reads.reverse.tolist() == [True, True, False]
+        assert reads.start.tolist() == [858, 848, 185]
+        assert reads.end.tolist() == [833, 823, 210]
+        assert reads.dups.tolist() == [1, 2, 1]
+        assert other.accessions == ['H52E4QC02IFXP3', 'H52E4QC02GX5AX']
+        # Same read in both sections is interned once
+        assert reads.accession[0] == other.accession[1]
+        assert len( reads.table ) == 4
+
+    def test_strandcounts( self ):
+        reads, other = parse_read_block( block )
+        assert reads.strand_counts() == (1, 2)
+        assert reads.strand_counts( weighted=True ) == (1, 3)
+        assert other.strand_counts( weighted=True ) == (297, 0)
+
+    def test_empty( self ):
+        reads, other = parse_read_block( [] )
+        assert len( reads ) == 0 and len( other ) == 0
+        assert reads.strand_counts() == (0, 0)
+        assert reads.start.dtype.kind == 'i'
+
+class TestDiffVariantReads( object ):
+    def test_examplefiles( self ):
+        ''' Every read line is counted in Total Depth '''
+        for path in glob( os.path.join( example_files_dir, '*Diffs.txt' ) ):
+            d = Diffs( path )
+            for v in d.variants:
+                assert len( v.reads ) + len( v.other_reads ) == v.total_depth
+                assert v.reads.table is d.accessions
+            support = read_support_table( d.variants )
+            assert (support['var_forward'] + support['var_reverse']).tolist() == [len( v.reads ) for v in d.variants]
+            assert (support['other_forward'] + support['other_reverse']).tolist() == [len( v.other_reads ) for v in d.variants]
+
+    def test_withoutdiffs( self ):
+        dv = DiffVariant( **{
+            'Reference Accno': 'ref',
+            'Start Pos': 1,
+            'End Pos': 1,
+            'Ref Nuc': 'A',
+            'Var Nuc': 'T',
+            'Total Depth': 5,
+            'Var Freq': '60%',
+            'lines': block
+        } )
+        assert dv.strand_counts() == (1, 2)
+        assert len( dv.other_reads ) == 2
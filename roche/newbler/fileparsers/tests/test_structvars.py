@@ -134,6 +134,16 @@ H52E4QC02H1NF7               28+ GGG-AGTTGAA-C-CTATCGACAATGTGAT-GGGAATGATTGGGA--
         assert len( sv['>H3N2/EPI353903/Victoria361_E3E3/2011/PB2'] ) == 1
         assert len( sv['>H3N2/EPI353903/Victoria361_E3E3/2011/PB1'] ) == 1
 
+    def test_overlapping( self ):
+        sio = StringIO( self.shdrs + self.var + self.var.replace( 'PB2', 'PB1' ) )
+        sv = StructVars( sio )
+        ref = '>H3N2/EPI353903/Victoria361_E3E3/2011/PB2'
+        pos = sv[ref][0].refpos1
+        assert sv.overlapping( ref, pos, pos ) == sv[ref]
+        assert sv.overlapping( ref, 1, pos - 1 ) == []
+        assert sv.overlapping( ref, pos + 1, pos + 100 ) == []
+        assert sv.overlapping( 'missing', 1, pos ) == []
+
 class TestStructVariant( object ):
     def test_tostring( self ):
         parts = {
@@ -0,0 +1,68 @@
+from nose.tools import eq_, raises
+import os
+import os.path
+import tempfile
+import shutil
+from StringIO import StringIO
+
+from ..tokenizer import MappedFile, iter_lines, iter_line_offsets, read_lines, split_fields, \
+    field_table, convert_column
+
+TEXT = '>ref 1\n1\tA\t10\n\n2\tC\t11\nlast line without end'
+
+class TestMappedFile( object ):
+    def setUp( self ):
+        self.tempdir = tempfile.mkdtemp()
+        self.path = os.path.join( self.tempdir, 'file.txt' )
+        with open( self.path, 'w' ) as fh:
+            fh.write( TEXT )
+
+    def tearDown( self ):
+        shutil.rmtree( self.tempdir )
+
+    def test_sources( self ):
+        ''' Path, open file and StringIO all give the same lines '''
+        expected = TEXT.split( '\n' )
+        with MappedFile( self.path ) as mf:
+            eq_( self.path, mf.name )
+            eq_( expected, list( mf.lines() ) )
+        with open( self.path ) as fh:
+            fh.readline()
+            # Always from the start of the file
+            eq_( expected, list( MappedFile( fh ).lines() ) )
+        mf = MappedFile( StringIO( TEXT ) )
+        eq_( 'Memory', mf.name )
+        eq_( expected, list( mf.lines() ) )
+
+    def test_empty( self ):
+        open( self.path, 'w' ).close()
+        with MappedFile( self.path ) as mf:
+            eq_( 0, len( mf ) )
+            eq_( [], list( mf.lines() ) )
+
+class TestLines( object ):
+    def test_chunks( self ):
+        ''' Any chunk size gives the same lines and offsets '''
+        expected = TEXT.split( '\n' )
+        offsets = [0]
+        for line in expected[:-1]:
+            offsets.append( offsets[-1] + len( line ) + 1 )
+        for chunksize in (1, 2, 5, 7, 1000):
+            eq_( expected, list( iter_lines( TEXT, chunksize=chunksize ) ) )
+            eq_( zip( offsets, expected ), list( iter_line_offsets( TEXT, chunksize=chunksize ) ) )
+
+    def test_range( self ):
+        start = TEXT.index( '2\t' )
+        eq_( ['2\tC\t11'], read_lines( TEXT, start, start + 7 ) )
+        eq_( ['2\tC\t11', 'last line without end'], read_lines( TEXT, start ) )
+        eq_( [], read_lines( '' ) )
+
+class TestColumns( object ):
+    def test_convert( self ):
+        table = field_table( split_fields( ['1\tA\t10', '2\tC\t11'] ) )
+        eq_( [10, 11], convert_column( table, 2, int ).tolist() )
+        eq_( ['A', 'C'], convert_column( table, 1, 'S1' ).tolist() )
+
+    @raises( ValueError )
+    def test_invalid( self ):
+        convert_column( field_table( [['1'], ['x']] ), 0, int )
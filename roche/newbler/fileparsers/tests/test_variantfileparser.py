@@ -1,6 +1,10 @@
 import nose
+import gc
+import random
 
-from ..variantfileparser import VarFile, Variant, VAR_DIVIDER, HDR_DIVIDER
+from ..variantfileparser import VarFile, Variant, FileBlock, IntervalIndex, VAR_DIVIDER, HDR_DIVIDER
+from ..diffs import Diffs
+from ..structvars import StructVars
 
 from StringIO import StringIO
 import fnmatch
@@ -94,6 +98,163 @@ Accno1	Pos1	Side1	Name1	Accno2	Pos2	Side2	Name2	Depth	Freq	Length'''
             inst = VarFileSub( StringIO( hdr ) )
             assert inst.headers == expect, "Headers parsed {} does not equal {}".format( inst.headers, expect )
 
+class TestVariantBlocks( object ):
+    def eager_lines( self, fp ):
+        ''' Lines of every variant the way read_until_next_variant gives them '''
+        vf = VarFileSub( fp )
+        return [varlines[1:] for varlines in vf.read_until_next_variant()]
+
+    def test_blocksmatcheagerlines( self ):
+        for bn, fp in var_files.items():
+            vf = VarFileSub( fp )
+            blocks = [block.read() for summary, block in vf.read_variant_blocks()]
+            assert blocks == self.eager_lines( fp ), bn
+
+    def test_variantlineslazy( self ):
+        for bn, fp in var_files.items():
+            if 'Diffs' in bn:
+                vf = Diffs( fp )
+            else:
+                vf = StructVars( fp )
+            variants = vf.variants
+            for v in variants:
+                assert isinstance( v._lines, FileBlock )
+            # Lines can still be read after the VarFile is gone
+            del vf
+            expected = self.eager_lines( fp )
+            assert [v.lines for v in variants] == expected, bn
+            assert all( isinstance( v._lines, list ) for v in variants )
+
+    def test_nofdsheld( self ):
+        ''' Variants with unread lines do not keep their file open '''
+        if not os.path.isdir( '/proc/self/fd' ):
+            raise nose.SkipTest( 'Needs /proc to count open files' )
+        gc.collect()
+        before = len( os.listdir( '/proc/self/fd' ) )
+        variants = []
+        for i in range( 5 ):
+            for bn, fp in var_files.items():
+                if 'Diffs' in bn:
+                    variants += Diffs( fp ).variants
+                else:
+                    variants += StructVars( fp ).variants
+        gc.collect()
+        assert len( os.listdir( '/proc/self/fd' ) ) == before
+        assert all( isinstance( v._lines, FileBlock ) for v in variants )
+        assert all( v.lines for v in variants )
+
+    def test_livevarfilefds( self ):
+        ''' A live VarFile only keeps the file handle it was given open '''
+        if not os.path.isdir( '/proc/self/fd' ):
+            raise nose.SkipTest( 'Needs /proc to count open files' )
+        gc.collect()
+        before = len( os.listdir( '/proc/self/fd' ) )
+        varfiles = []
+        for bn, fp in var_files.items():
+            if 'Diffs' in bn:
+                varfiles.append( Diffs( fp ) )
+            else:
+                varfiles.append( StructVars( fp ) )
+        assert len( os.listdir( '/proc/self/fd' ) ) == before + len( varfiles )
+        # Blocks and tables are still readable from the closed map
+        for vf in varfiles:
+            assert all( v.lines for v in vf.variants )
+            assert next( vf.lines ).startswith( '>' )
+            if isinstance( vf, Diffs ):
+                assert len( vf.to_table()['start_pos'] ) == len( vf.variants )
+        assert len( os.listdir( '/proc/self/fd' ) ) == before + len( varfiles )
+
+    def test_memorysource( self ):
+        ''' StringIO blocks are read from the kept contents '''
+        for bn, fp in var_files.items():
+            with open( fp ) as fh:
+                sio = StringIO( fh.read() )
+            vf = VarFileSub( sio )
+            blocks = [block.read() for summary, block in vf.read_variant_blocks()]
+            assert blocks == self.eager_lines( fp ), bn
+
+    def test_nolinesheld( self ):
+        ''' A parsed file does not keep any split lines or paused line iterators '''
+        import types
+        for bn, fp in var_files.items():
+            if 'Diffs' in bn:
+                vf = Diffs( fp )
+            else:
+                vf = StructVars( fp )
+            for name, value in vf.__dict__.items():
+                assert not isinstance( value, types.GeneratorType ), name
+                if isinstance( value, list ):
+                    assert not any( isinstance( v, basestring ) for v in value ) or name == 'headers', name
+            assert len( vf.headers ) > 5
+            assert vf.lines.next().startswith( '>' )
+
+    def test_noleak( self ):
+        ''' Parsed files can be freed even though VarFile has __del__ '''
+        gc.collect()
+        garbage = len( gc.garbage )
+        for i in range( 5 ):
+            for bn, fp in var_files.items():
+                if 'Diffs' in bn:
+                    Diffs( fp )
+                else:
+                    StructVars( fp )
+        gc.collect()
+        eq = len( gc.garbage ) == garbage
+        del gc.garbage[garbage:]
+        assert eq, 'VarFiles ended up in gc.garbage'
+
+    def test_trailingsectiondropped( self ):
+        fp = StringIO( 'A\tB\n1\t2\n>a\t1\nline1\n\nline2\n{0}\n>b\t2\nline3\n'.format( VAR_DIVIDER ) )
+        vf = VarFileSub( fp )
+        blocks = list( vf.read_variant_blocks() )
+        assert len( blocks ) == 1
+        assert blocks[0][0] == '>a\t1'
+        assert blocks[0][1].read() == ['line1', 'line2']
+
+class TestIntervalIndex( object ):
+    def setUp( self ):
+        self.intervals = [(10, 10), (1, 5), (3, 3), (20, 40), (8, 12)]
+        self.index = IntervalIndex( self.intervals, ['a', 'b', 'c', 'd', 'e'] )
+
+    def test_startorder( self ):
+        assert self.index.variants == ['b', 'c', 'e', 'a', 'd']
+
+    def test_overlapping( self ):
+        for start, end, expected in (
+                (1, 1, ['b']),
+                (3, 3, ['b', 'c']),
+                (6, 7, []),
+                (11, 11, ['e']),
+                (9, 25, ['e', 'a', 'd']),
+                (40, 50, ['d']),
+                (41, 50, [])):
+            got = self.index.overlapping( start, end )
+            assert got == expected, (start, end, got)
+
+    def test_empty( self ):
+        assert IntervalIndex( [], [] ).overlapping( 1, 10 ) == []
+
+    def test_randomagainstscan( self ):
+        rand = random.Random( 3 )
+        intervals = []
+        for i in range( 500 ):
+            s = rand.randint( 1, 5000 )
+            intervals.append( (s, s + rand.choice( (0, 0, 1, 3, 20, 400, 3000) )) )
+        index = IntervalIndex( intervals, range( len( intervals ) ) )
+        for i in range( 200 ):
+            start = rand.randint( 1, 8000 )
+            end = start + rand.choice( (0, 2, 50, 1000) )
+            expected = sorted( [j for j, (s, e) in enumerate( intervals ) if s <= end and e >= start],
+                key=lambda j: (intervals[j], j) )
+            assert index.overlapping( start, end ) == expected, (start, end)
+
+    def test_longvariant( self ):
+        ''' A long deletion does not widen the search for the short variants '''
+        intervals = [(1, 10000)] + [(p, p) for p in range( 1, 5000 )]
+        index = IntervalIndex( intervals, range( len( intervals ) ) )
+        assert sorted( b[3] for b in index.buckets ) == [0, 9999]
+        assert index.overlapping( 2500, 2500 ) == [0, 2500]
+
 class MockVariant( Variant ):
     test_attr1 = "Test Attr1"
     test_attr_2 = "Test Attr 2"
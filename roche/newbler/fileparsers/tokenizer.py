@@ -0,0 +1,158 @@
+###
+## Shared line and column splitting for the tab separated Newbler files
+###
+
+import mmap
+from itertools import chain
+from StringIO import StringIO
+
+import numpy as np
+
+# Amount of the file that is split into lines at once
+CHUNK_SIZE = 1 << 20
+
+class MappedFile( object ):
+    '''
+        Read only view of a whole file that is memory mapped when possible so
+        lines and byte ranges can be taken from it without reading it line by line.
+        Empty files and in memory files(StringIO) are held as a str instead
+    '''
+    def __init__( self, source ):
+        '''
+            @param source - File path, open file or StringIO. Open files are always
+                mapped from the start no matter their current position
+        '''
+        self._fh = None
+        self._map = None
+        if isinstance( source, basestring ):
+            self.name = source
+            self._fh = source = open( source, 'rb' )
+        else:
+            self.name = getattr( source, 'name', 'Memory' )
+        if isinstance( source, StringIO ) or not hasattr( source, 'fileno' ):
+            if hasattr( source, 'getvalue' ):
+                self.data = source.getvalue()
+            else:
+                self.data = source.read()
+        else:
+            try:
+                self._map = mmap.mmap( source.fileno(), 0, access=mmap.ACCESS_READ )
+                self.data = self._map
+            except ValueError:
+                # Empty files cannot be mapped
+                self.data = ''
+
+    def __len__( self ):
+        return len( self.data )
+
+    def lines( self, start=0, end=None ):
+        ''' Lines of the file(see iter_lines) '''
+        return iter_lines( self.data, start, end )
+
+    def line_offsets( self, start=0, end=None ):
+        ''' (offset, line) of the file(see iter_line_offsets) '''
+        return iter_line_offsets( self.data, start, end )
+
+    def close( self ):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        self.data = ''
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *args ):
+        self.close()
+
+def _chunks( data, start, end, chunksize ):
+    ''' (offset, str) of pieces of data[start:end] that only end on a line end '''
+    if end is None:
+        end = len( data )
+    pos = start
+    while pos < end:
+        cend = min( pos + chunksize, end )
+        if cend < end:
+            nl = data.rfind( '\n', pos, cend )
+            if nl == -1:
+                # Line longer than a chunk
+                nl = data.find( '\n', cend, end )
+                if nl == -1:
+                    nl = end - 1
+            cend = nl + 1
+        yield pos, data[pos:cend]
+        pos = cend
+
+def _chunk_lines( data, start, end, chunksize ):
+    ''' List of lines of every chunk '''
+    for offset, chunk in _chunks( data, start, end, chunksize ):
+        lines = chunk.split( '\n' )
+        if chunk.endswith( '\n' ):
+            lines.pop()
+        yield lines
+
+def iter_lines( data, start=0, end=None, chunksize=CHUNK_SIZE ):
+    '''
+        Iterator of the lines in data[start:end] without their \\n that splits a
+        chunk at a time instead of reading a line at a time
+
+        @param data - str or mmap
+        @param start - Offset to start at(should be the start of a line)
+        @param end - Offset to stop at. Defaults to the end of data
+        @param chunksize - Number of bytes to split at once
+
+        >>> list( iter_lines( 'a\\tb\\n\\nc\\n' ) )
+        ['a\\tb', '', 'c']
+        >>> list( iter_lines( 'a\\nb', chunksize=1 ) )
+        ['a', 'b']
+    '''
+    return chain.from_iterable( _chunk_lines( data, start, end, chunksize ) )
+
+def read_lines( data, start=0, end=None ):
+    ''' All lines in data[start:end] as a list(see iter_lines) '''
+    return list( iter_lines( data, start, end, len( data ) or 1 ) )
+
+def iter_line_offsets( data, start=0, end=None, chunksize=CHUNK_SIZE ):
+    '''
+        Same as iter_lines but yields (offset, line) where offset is where the
+        line starts in data
+
+        >>> list( iter_line_offsets( 'ab\\n\\ncd' ) )
+        [(0, 'ab'), (3, ''), (4, 'cd')]
+    '''
+    for offset, chunk in _chunks( data, start, end, chunksize ):
+        lines = chunk.split( '\n' )
+        if chunk.endswith( '\n' ):
+            lines.pop()
+        for line in lines:
+            yield offset, line
+            offset += len( line ) + 1
+
+def split_fields( lines, sep='\t' ):
+    ''' List of the fields of every line '''
+    return [line.split( sep ) for line in lines]
+
+def field_table( rows ):
+    '''
+        2d string array of rows that all have the same number of fields so whole
+        columns can be converted at once(see convert_column)
+    '''
+    return np.array( rows )
+
+def convert_column( table, index, dtype ):
+    '''
+        Convert a column of a field_table to dtype in one go
+
+        @param table - field_table
+        @param index - Column index
+        @param dtype - numpy dtype
+        @return numpy array
+        @raises ValueError if any value cannot be converted
+
+        >>> convert_column( field_table( [['1', '2.5'], ['3', '4']] ), 1, float ).tolist()
+        [2.5, 4.0]
+    '''
+    return table[:,index].astype( dtype )
@@ -1,10 +1,151 @@
 from StringIO import StringIO
 from itertools import izip_longest
+from bisect import bisect_left, bisect_right
+import os.path
 import string
 
+from tokenizer import MappedFile, read_lines
+
 VAR_DIVIDER = '-----------------------------'
 HDR_DIVIDER = '______________________________'
 
+def is_blank( line ):
+    ''' Lines that are skipped when reading variant files '''
+    return line in string.whitespace + HDR_DIVIDER
+
+def find_line( data, line, start=0 ):
+    '''
+        Offset of the first line that is exactly line at or after start
+
+        @param data - str or mmap
+        @param line - Line to find without line ending
+        @param start - Offset to search from
+        @return offset of the start of the line or -1 if it is not found
+
+        >>> find_line( 'ab\\nb\\nbc\\n', 'b' )
+        3
+        >>> find_line( 'ab\\nbc', 'b' )
+        -1
+    '''
+    size = len( data )
+    pos = start
+    while True:
+        pos = data.find( line, pos )
+        if pos == -1:
+            return -1
+        end = pos + len( line )
+        if (pos == 0 or data[pos-1] == '\n') and (end == size or data[end] == '\n'):
+            return pos
+        pos += 1
+
+def nonblank_line_offsets( mapped, start=0 ):
+    ''' Yield (offset, line) for all non-blank lines of a MappedFile from start '''
+    for offset, line in mapped.line_offsets( start ):
+        if is_blank( line ):
+            continue
+        yield offset, line
+
+class IntervalIndex( object ):
+    '''
+        Variants of a single reference sorted by start position so the ones
+        that overlap a range can be found with bisect.
+        Variants are split into buckets of similar length(powers of 2) so a long
+        variant only widens the search of the bucket it is in
+    '''
+    def __init__( self, intervals, variants ):
+        '''
+            @param intervals - List of (start, end) for every variant(inclusive)
+            @param variants - List of variants
+        '''
+        order = sorted( range( len( variants ) ), key=lambda i: intervals[i] )
+        self.starts = [intervals[i][0] for i in order]
+        self.ends = [intervals[i][1] for i in order]
+        self.variants = [variants[i] for i in order]
+        # bucket: [starts, ends, indexes into self.variants, longest length]
+        buckets = {}
+        for i, (s, e) in enumerate( zip( self.starts, self.ends ) ):
+            length = e - s
+            bucket = buckets.setdefault( max( length, 0 ).bit_length(), [[], [], [], 0] )
+            bucket[0].append( s )
+            bucket[1].append( e )
+            bucket[2].append( i )
+            bucket[3] = max( bucket[3], length )
+        self.buckets = buckets.values()
+
+    def overlapping( self, start, end ):
+        '''
+            @param start - Start position of the range
+            @param end - End position of the range(inclusive)
+            @return list of variants with start <= end and end >= start in start order
+        '''
+        found = []
+        for starts, ends, indexes, maxlength in self.buckets:
+            # Only variants that start this far before a range can reach into it
+            lo = bisect_left( starts, start - maxlength )
+            hi = bisect_right( starts, end )
+            found += [indexes[i] for i in xrange( lo, hi ) if ends[i] >= start]
+        found.sort()
+        return [self.variants[i] for i in found]
+
+class BlockSource( object ):
+    '''
+        Where FileBlocks read their bytes from. Files are opened only for the
+        time it takes to read a block so no file handle or mmap is held between reads.
+        In memory files(StringIO) keep their contents instead
+    '''
+    def __init__( self, filepath=None, data=None ):
+        '''
+            @param filepath - Path to the file
+            @param data - Contents of an in memory file(used instead of filepath)
+        '''
+        self.filepath = filepath
+        self.data = data
+
+    @classmethod
+    def from_mapped( cls, mapped ):
+        ''' BlockSource for the file of a MappedFile '''
+        if mapped._map is None:
+            return cls( data=mapped.data )
+        return cls( filepath=os.path.abspath( mapped.name ) )
+
+    def open( self ):
+        ''' MappedFile of the whole file that has to be closed when done '''
+        if self.data is not None:
+            return MappedFile( StringIO( self.data ) )
+        return MappedFile( self.filepath )
+
+    def read( self, offset, length ):
+        ''' length bytes starting at offset '''
+        if self.data is not None:
+            return self.data[offset:offset+length]
+        with open( self.filepath, 'rb' ) as fh:
+            fh.seek( offset )
+            return fh.read( length )
+
+class FileBlock( object ):
+    '''
+        Pointer to the lines of a variant section so they are only read from the
+        file when they are needed.
+        The file is reopened by path for every read so the file must not be moved
+        or changed while there are blocks that have not been read yet
+    '''
+    __slots__ = ('source', 'offset', 'length')
+
+    def __init__( self, source, offset, length ):
+        '''
+            @param source - BlockSource the block is in
+            @param offset - Byte offset of the first line of the block
+            @param length - Number of bytes in the block
+        '''
+        self.source = source
+        self.offset = offset
+        self.length = length
+
+    def read( self ):
+        ''' List of the non-blank lines in the block '''
+        lines = read_lines( self.source.read( self.offset, self.length ) )
+        return [line for line in lines if not is_blank( line )]
+
 class VarFile( object ):
     def __init__( self, fh_or_filepath ):
         ''' Init the class '''
@@ -12,6 +153,8 @@ class VarFile( object ):
         self._variant_list = []
         # Also key the variants by the refaccno1
         self._variant_by_name = {}
+        # IntervalIndex of each refaccno that is built the first time it is used
+        self._intervals = {}
         self.parse( fh_or_filepath )
 
     def parse( self, fh_or_filepath ):
@@ -22,9 +165,43 @@ class VarFile( object ):
             self.filepath = 'Memory'
         else:
             self.filepath = self.fh.name
-        self.lines = self.all_lines()
-        self.parse_header()
-        self.parse_variants()
+        self.mapped = MappedFile( self.fh )
+        self.source = BlockSource.from_mapped( self.mapped )
+        try:
+            self.parse_header()
+            self.parse_variants()
+        finally:
+            # Nothing needs the map after parsing so no mmap or fd is kept for it
+            self.mapped.close()
+            self.mapped = None
+
+    def open_mapped( self ):
+        '''
+            MappedFile of the file. This is the one used for parsing while parsing
+            and otherwise a new one from source that has to be closed with close_mapped
+        '''
+        if self.mapped is not None:
+            return self.mapped
+        return self.source.open()
+
+    def close_mapped( self, mapped ):
+        ''' Close a MappedFile from open_mapped if it is not the one used for parsing '''
+        if mapped is not self.mapped:
+            mapped.close()
+
+    @property
+    def lines( self ):
+        ''' Iterator of the non-blank lines after the header '''
+        return self.iter_lines()
+
+    def iter_lines( self ):
+        ''' Yield the non-blank lines after the header '''
+        mapped = self.open_mapped()
+        try:
+            for offset, line in nonblank_line_offsets( mapped, self.body_offset ):
+                yield line
+        finally:
+            self.close_mapped( mapped )
 
     @property
     def variants( self ):
@@ -42,6 +219,28 @@ class VarFile( object ):
         if name not in self._variant_by_name:
             self._variant_by_name[name] = []
         self._variant_by_name[name].append( self._variant_list[-1] )
+        self._intervals.pop( name, None )
+
+    def variant_interval( self, variant ):
+        ''' (start, end) reference positions of a variant '''
+        raise NotImplementedError( "variant_interval needs to be implemented in subclass" )
+
+    def overlapping( self, refaccno, start, end ):
+        '''
+            Variants of a reference that overlap a range of positions
+
+            @param refaccno - Reference key(same as for __getitem__)
+            @param start - Start position
+            @param end - End position(inclusive)
+            @return list of variants in start position order
+        '''
+        if refaccno not in self._variant_by_name:
+            return []
+        if refaccno not in self._intervals:
+            variants = self._variant_by_name[refaccno]
+            intervals = [self.variant_interval( v ) for v in variants]
+            self._intervals[refaccno] = IntervalIndex( intervals, variants )
+        return self._intervals[refaccno].overlapping( start, end )
 
     def parse_variants( self ):
         raise NotImplementedError( "parse_variants needs to be implemented in subclass" )
@@ -57,20 +256,79 @@ class VarFile( object ):
                 yield var_lines
                 var_lines = []
 
+    def read_variant_blocks( self ):
+        '''
+            Generator of (summary line, FileBlock) for all variant sections where
+            the FileBlock holds the lines after the summary line up to the divider.
+            Sections are found by searching for the dividers so the lines inside of
+            them are never split
+        '''
+        mapped = self.open_mapped()
+        try:
+            data = mapped.data
+            size = len( data )
+            pos = self.body_offset
+            while pos < size:
+                # Summary line is the next non-blank line
+                end = data.find( '\n', pos )
+                if end == -1:
+                    end = size
+                summary = data[pos:end]
+                if is_blank( summary ):
+                    pos = end + 1
+                    continue
+                divider = find_line( data, VAR_DIVIDER, end )
+                if divider == -1:
+                    # Section that is not ended by a divider is ignored
+                    return
+                start = min( end + 1, divider )
+                yield summary, FileBlock( self.source, start, divider - start )
+                pos = divider + len( VAR_DIVIDER ) + 1
+        finally:
+            self.close_mapped( mapped )
+
+    def all_line_offsets( self ):
+        ''' Iterator of (offset, line) for all non-blank lines '''
+        self.mapped = MappedFile( self.fh )
+        return nonblank_line_offsets( self.mapped )
+
     def all_lines( self ):
         ''' Yield all non-blank lines '''
-        for line in self.fh:
-            line = line.rstrip( '\n' )
-            if line in string.whitespace + HDR_DIVIDER:
-                continue
+        for offset, line in self.all_line_offsets():
             yield line
 
     def parse_header( self ):
         ''' Chomp off top two lines and parse into list of headers '''
-        line1 = next( self.lines ).replace( ' ', '' ).split( '\t' )
-        line2 = next( self.lines ).replace( ' ', '' ).split( '\t' )
+        line1, line2 = self.header_lines()
+        line1 = line1.replace( ' ', '' ).split( '\t' )
+        line2 = line2.replace( ' ', '' ).split( '\t' )
         self.headers = [" ".join( hdr ).rstrip() for hdr in izip_longest( line1, line2, fillvalue='' )]
 
+    def header_lines( self ):
+        '''
+            First two non-blank lines of the file. Only those lines are split off
+            so nothing else of the file is kept. Sets body_offset to where the
+            variant sections start
+
+            @raises ValueError if the file does not have two lines
+        '''
+        data = self.mapped.data
+        size = len( data )
+        pos = 0
+        lines = []
+        while len( lines ) < 2:
+            if pos >= size:
+                raise ValueError( "{} does not have a header".format( self.filepath ) )
+            end = data.find( '\n', pos )
+            if end == -1:
+                end = size
+            line = data[pos:end]
+            if not is_blank( line ):
+                lines.append( line )
+            pos = end + 1
+        self.body_offset = pos
+        return lines
+
     def parse_summary_line( self, line ):
         ''' Parse a summary line(starts with >) '''
         cols = line.split( '\t' )
@@ -81,6 +339,8 @@ class VarFile( object ):
         return dict( zip( self.headers, cols ) )
 
     def __del__( self ):
+        if getattr( self, 'mapped', None ) is not None:
+            self.mapped.close()
         self.fh.close()
 
 class Variant( object ):
@@ -0,0 +1,100 @@
+import os
+import os.path
+import tempfile
+import shutil
+
+from nose.tools import eq_, raises
+import numpy as np
+
+from ..projectdir import ProjectDirectory
+from ..coveragematrix import CoverageMatrix, reference_lengths
+from ..fileparsers.alignmentinfo import AlignmentInfo
+from ..fileparsers.tests import fixtures as fpfixtures
+
+class TestCoverageMatrix( object ):
+    def setUp( self ):
+        self.projpaths = fpfixtures.GSPROJECTS['mapping']
+        self.projects = [ProjectDirectory( p ) for p in self.projpaths]
+        self.tempdir = tempfile.mkdtemp()
+        # A shallower sample of the first project with a hole in it and its end cut off
+        with open( self.projects[0].get_file( '454AlignmentInfo' ) ) as fh:
+            lines = fh.readlines()
+        partial = os.path.join( self.tempdir, 'partial.tsv' )
+        with open( partial, 'w' ) as fh:
+            for i, line in enumerate( lines[:len( lines ) * 3 / 5] ):
+                if len( lines ) / 5 < i < len( lines ) * 3 / 10 and not line.startswith( '>' ):
+                    continue
+                fh.write( line )
+        self.paths = [pd.get_file( '454AlignmentInfo' ) for pd in self.projects] + [partial]
+
+    def tearDown( self ):
+        shutil.rmtree( self.tempdir )
+
+    def _check( self, cm, paths=None ):
+        if paths is None:
+            paths = self.paths
+        eq_( len( paths ), len( cm.samples ) )
+        refs = set()
+        for row, path in enumerate( paths ):
+            ai = AlignmentInfo( path, columnar=True )
+            for ref in ai._refs:
+                depth = ai.track( ref ).adepth
+                eq_( depth.tolist(), cm[ref][row,:len( depth )].tolist() )
+                # Padded with 0 past what this sample covers
+                eq_( 0, cm[ref][row,len( depth ):].sum() )
+            # References this sample does not have are all 0
+            for ref in set( cm.references ) - set( ai._refs ):
+                eq_( 0, cm[ref][row].sum() )
+            refs.update( ai._refs )
+        eq_( sorted( refs ), cm.references )
+
+    def test_reference_lengths( self ):
+        for path in self.paths:
+            ai = AlignmentInfo( path, columnar=True )
+            eq_( dict( (ref, len( ai.track( ref ) )) for ref in ai._refs ), reference_lengths( path ) )
+
+    def test_reference_lengths_blanks( self ):
+        ''' Blank lines at the end of blocks and empty blocks '''
+        path = os.path.join( self.tempdir, 'blanks.tsv' )
+        with open( path, 'w' ) as fh:
+            fh.write( '>a 1\n1\tA\n5\tC\n\n\n>b 1\n>a 7\n7\tG\n9\tT' )
+        eq_( {'a': 9}, reference_lengths( path ) )
+
+    def test_samples_differ( self ):
+        ''' Rows of the same reference are filled separately '''
+        cm = CoverageMatrix.from_files( self.paths )
+        ref = AlignmentInfo( self.paths[0] )._refs.keys()[0]
+        full, partial = cm[ref][0], cm[ref][2]
+        assert full.tolist() != partial.tolist()
+        assert partial[-1] == 0 and full[-1] != 0
+        assert (partial == 0).sum() > (full == 0).sum()
+
+    def test_in_memory( self ):
+        cm = CoverageMatrix.from_projects( self.projects )
+        eq_( [os.path.basename( p ) for p in self.projpaths], cm.samples )
+        self._check( cm, self.paths[:2] )
+
+    def test_from_files( self ):
+        self._check( CoverageMatrix.from_files( self.paths ) )
+
+    def test_memmap( self ):
+        tempdir = os.path.join( self.tempdir, 'matrices' )
+        os.mkdir( tempdir )
+        cm = CoverageMatrix.from_files( self.paths, directory=tempdir )
+        assert all( isinstance( m, np.memmap ) for m in cm.matrices.values() )
+        eq_( len( cm.references ), len( os.listdir( tempdir ) ) )
+        self._check( cm )
+
+    def test_workers( self ):
+        cm = CoverageMatrix.from_files( self.paths, workers=2 )
+        self._check( cm )
+
+    def test_depth( self ):
+        names = [str( i ) for i in range( len( self.paths ) )]
+        cm = CoverageMatrix.from_files( self.paths, names=names )
+        ref = cm.references[0]
+        eq_( cm[ref][1].tolist(), cm.depth( '1', ref ).tolist() )
+
+    @raises( ValueError )
+    def test_badnames( self ):
+        CoverageMatrix.from_projects( self.projects, names=['one'] )